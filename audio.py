@@ -1,11 +1,8 @@
 import os
-import wave
-import struct
-import hashlib
-import time
-import numpy as np
 import customtkinter as ctk
 from tkinter import messagebox
+from audio_lsb import generate_hashed_filename
+import backends
 
 # Output directories
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audio')
@@ -16,55 +13,6 @@ DECODE_DIR = os.path.join(OUTPUT_DIR, 'decode')
 os.makedirs(ENCODE_DIR, exist_ok=True)
 os.makedirs(DECODE_DIR, exist_ok=True)
 
-def generate_hashed_filename():
-    timestamp = str(time.time()).encode()
-    return hashlib.sha256(timestamp).hexdigest()[:10]
-
-def encode_message(audio_file, message_file, passphrase, output_dir):
-    # Read message from file
-    with open(message_file, 'r') as file:
-        message = file.read()
-
-    message += f"\n{passphrase}"  # Append passphrase to message
-
-    with wave.open(audio_file, 'rb') as wav:
-        params = wav.getparams()
-        frames = wav.readframes(params.nframes)
-        
-        frame_array = np.frombuffer(frames, dtype=np.int16)
-        message_bits = ''.join(format(ord(c), '08b') for c in message)
-
-        if len(message_bits) > len(frame_array):
-            raise ValueError("Message is too large for the audio file.")
-
-        # Embed message
-        for i, bit in enumerate(message_bits):
-            frame_array[i] = (frame_array[i] & ~1) | int(bit)
-
-        # Save encoded audio
-        output_file = os.path.join(output_dir, f"{generate_hashed_filename()}.wav")
-        with wave.open(output_file, 'wb') as out_wav:
-            out_wav.setparams(params)
-            out_wav.writeframes(frame_array.tobytes())
-
-        return output_file
-
-def decode_message(audio_file, passphrase):
-    with wave.open(audio_file, 'rb') as wav:
-        frames = wav.readframes(wav.getnframes())
-        
-        frame_array = np.frombuffer(frames, dtype=np.int16)
-        bits = [str(frame_array[i] & 1) for i in range(len(frame_array))]
-        
-        message = ''.join([chr(int(''.join(bits[i:i+8]), 2)) for i in range(0, len(bits), 8)])
-        
-        decoded_message, _, decoded_passphrase = message.partition('\n')
-
-        if decoded_passphrase != passphrase:
-            raise ValueError("Incorrect passphrase.")
-
-        return decoded_message
-
 class AudioSteganography(ctk.CTkFrame):
     def __init__(self, parent):
         super().__init__(parent)
@@ -125,7 +73,7 @@ class AudioSteganography(ctk.CTkFrame):
             self.audio_entry.insert(0, audio_path)
 
     def upload_message(self):
-        message_path = ctk.filedialog.askopenfilename(filetypes=[("Text Files", "*.txt")])
+        message_path = ctk.filedialog.askopenfilename(filetypes=[("All Files", "*.*"), ("Text Files", "*.txt")])
         if message_path:
             self.message_entry.delete(0, ctk.END)
             self.message_entry.insert(0, message_path)
@@ -146,7 +94,8 @@ class AudioSteganography(ctk.CTkFrame):
             return
 
         try:
-            output_file = encode_message(audio_file, message_file, passphrase, ENCODE_DIR)
+            output_file = os.path.join(ENCODE_DIR, f"{generate_hashed_filename()}.wav")
+            backends.embed(audio_file, message_file, passphrase, output_file, 'lsb')
             messagebox.showinfo("Success", f"Message encoded successfully! Output: {output_file}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to encode message: {e}")
@@ -160,10 +109,8 @@ class AudioSteganography(ctk.CTkFrame):
             return
 
         try:
-            message = decode_message(audio_file, passphrase)
             output_file = os.path.join(DECODE_DIR, f"{generate_hashed_filename()}.txt")
-            with open(output_file, 'w') as file:
-                file.write(message)
+            backends.extract(audio_file, passphrase, output_file, 'lsb')
 
             messagebox.showinfo("Decoded Message", f"Message saved to: {output_file}")
         except Exception as e:
@@ -1,21 +1,11 @@
 import os
-import subprocess
 import hashlib
 import time
 import customtkinter as ctk
 from tkinter import messagebox
+import backends
+import job_runner
 
-# Function to find the steghide executable
-def find_steghide():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    steghide_path = os.path.join(current_dir, 'steghide', 'steghide.exe')
-    #encode_path = os.path.join(current_dir, 'steghide', 'steghide.exe')
-    if not os.path.exists(steghide_path):
-        raise FileNotFoundError("steghide.exe not found in the 'steghide' directory.")
-    return steghide_path
-
-# Get the path to steghide executable
-STEGHIDE_PATH = find_steghide()
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audio')
 ENCODE_DIR = os.path.join(OUTPUT_DIR, 'encode')
 DECODE_DIR = os.path.join(OUTPUT_DIR, 'decode')
@@ -127,23 +117,21 @@ class AudioSteganography(ctk.CTkFrame):
         output_filename = generate_unique_filename(os.path.basename(carrier_path)) + ".mp3"
         output_file_path = os.path.join(ENCODE_DIR, output_filename)
 
-        command = [
-            STEGHIDE_PATH,
-            "embed",
-            "-cf", carrier_path,
-            "-ef", secret_path,
-            "-p", password,
-            "-sf", output_file_path  # Use -sf to specify output file directly.
-        ]
-
-        try:
-            result = subprocess.run(command, capture_output=True, text=True)
-            if result.returncode == 0:
-                messagebox.showinfo("Success", f"Hiding successful! File saved at:\n{output_file_path}")
-            else:
-                messagebox.showerror("Error", f"Steghide failed:\n{result.stderr}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to run Steghide: {e}")
+        # Runs on a worker thread; hide_done reports the outcome
+        def hide(job):
+            backends.embed(carrier_path, secret_path, password, output_file_path, 'steghide', run=job.run_command,
+                           progress=job.track, cancel=job)
+            return output_file_path
+
+        job_runner.submit(f"Hide in {os.path.basename(carrier_path)}", hide, on_done=self.hide_done)
+
+    def hide_done(self, job):
+        if job.state == job_runner.DONE:
+            messagebox.showinfo("Success", f"Hiding successful! File saved at:\n{job.result}")
+        elif isinstance(job.error, (RuntimeError, ValueError)):
+            messagebox.showerror("Error", str(job.error))
+        elif job.error:
+            messagebox.showerror("Error", f"Failed to run Steghide: {job.error}")
 
     def extract_action(self):
         carrier_path = self.extract_carrier_entry.get()
@@ -160,22 +148,21 @@ class AudioSteganography(ctk.CTkFrame):
         output_filename = generate_unique_filename(os.path.basename(carrier_path)) + ".txt"
         output_file_path = os.path.join(DECODE_DIR, output_filename)
 
-        command = [
-            STEGHIDE_PATH,
-            "extract",
-            "-sf", carrier_path,
-            "-xf", output_file_path,
-            "-p", password
-        ]
-
-        try:
-            result = subprocess.run(command, capture_output=True, text=True)
-            if result.returncode == 0:
-                messagebox.showinfo("Success", f"Extraction successful! File saved at:\n{output_file_path}")
-            else:
-                messagebox.showerror("Error", f"Steghide failed:\n{result.stderr}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to run Steghide: {e}")
+        # Runs on a worker thread; extract_done reports the outcome
+        def extract(job):
+            backends.extract(carrier_path, password, output_file_path, 'steghide', run=job.run_command,
+                             progress=job.track, cancel=job)
+            return output_file_path
+
+        job_runner.submit(f"Extract from {os.path.basename(carrier_path)}", extract, on_done=self.extract_done)
+
+    def extract_done(self, job):
+        if job.state == job_runner.DONE:
+            messagebox.showinfo("Success", f"Extraction successful! File saved at:\n{job.result}")
+        elif isinstance(job.error, (RuntimeError, ValueError)):
+            messagebox.showerror("Error", str(job.error))
+        elif job.error:
+            messagebox.showerror("Error", f"Failed to run Steghide: {job.error}")
 
     def reset_hide_fields(self):
         self.carrier_entry.delete(0, ctk.END)
@@ -1,39 +1,10 @@
 import os
-import subprocess
 import hashlib
 import time
 import customtkinter as ctk
 from tkinter import messagebox
-
-# Function to find the steghide executable
-def find_steghide():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    steghide_path = os.path.join(current_dir, 'steghide', 'steghide.exe')
-    Encode_path = os.path.join(current_dir, 'audioTools' , 'MP3Stego', 'Encode.exe')
-    decode_path = os.path.join(current_dir, 'audioTools' , 'MP3Stego', 'Decode.exe')
-    if not os.path.exists(steghide_path):
-        raise FileNotFoundError("steghide.exe not found in the 'steghide' directory.")
-    return steghide_path
-def find_encode():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    Encode_path = os.path.join(current_dir, 'audioTools' , 'MP3Stego', 'Encode.exe')
-    
-    if not os.path.exists(Encode_path):
-        raise FileNotFoundError("Encode.exe not found in the 'steghide' directory.")
-    return Encode_path
-def find_decode():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    Decode_path = os.path.join(current_dir, 'audioTools' , 'MP3Stego', 'Decode.exe')
-    
-    if not os.path.exists(Decode_path):
-        raise FileNotFoundError("Decode.exe not found in the 'steghide' directory.")
-    return Decode_path
-# Get the path to steghide executable
-STEGHIDE_PATH = find_steghide()
-ENCODE_PATH= find_encode()
-DECODE_PATH = find_decode()
+import backends
+import job_runner
 
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audio')
 ENCODE_DIR = os.path.join(OUTPUT_DIR, 'encode')
@@ -146,23 +117,21 @@ class AudioSteganography3(ctk.CTkFrame):
         output_filename = generate_unique_filename(os.path.basename(carrier_path)) + ".mp3"
         output_file_path = os.path.join(ENCODE_DIR, output_filename)
 
-        command = [
-            ENCODE_PATH,
-            "-E", secret_path,
-            "-P", password,
-            carrier_path,  output_file_path  # Use -sf to specify output file directly.
-        ]
-
-        try:
-            result = subprocess.run(command, capture_output=True, text=True)
-            if result.returncode == 0:
-                messagebox.showinfo("Success", f"Hiding successful! File saved at:\n{output_file_path}")
-            else:
-                messagebox.showerror("Error", f"Steghide failed:\n{result.stderr}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to run Steghide: {e}")
+        # Runs on a worker thread; hide_done reports the outcome
+        def hide(job):
+            backends.embed(carrier_path, secret_path, password, output_file_path, 'mp3stego', run=job.run_command,
+                           progress=job.track, cancel=job)
+            return output_file_path
 
+        job_runner.submit(f"Hide in {os.path.basename(carrier_path)}", hide, on_done=self.hide_done)
 
+    def hide_done(self, job):
+        if job.state == job_runner.DONE:
+            messagebox.showinfo("Success", f"Hiding successful! File saved at:\n{job.result}")
+        elif isinstance(job.error, (RuntimeError, ValueError)):
+            messagebox.showerror("Error", str(job.error))
+        elif job.error:
+            messagebox.showerror("Error", f"Failed to run Encode.exe: {job.error}")
 
     def extract_action(self):
         carrier_path = self.extract_carrier_entry.get()
@@ -179,32 +148,19 @@ class AudioSteganography3(ctk.CTkFrame):
         output_filename = generate_unique_filename(os.path.basename(carrier_path)) + ".txt"
         output_file_path = os.path.join(DECODE_DIR, output_filename)
 
-        # Extract the directory from the DECODE_PATH
-        decode_dir = os.path.dirname(DECODE_PATH)
-
-        # Set the command to run Decode.exe
-        command = [
-            DECODE_PATH,
-            "-P", password, "-X", carrier_path, output_file_path
-        ]
-
-        try:
-            # Change working directory to where Decode.exe is located
-            os.chdir(decode_dir)
-
-            # Run the command to execute Decode.exe
-            result = subprocess.run(command, capture_output=True, text=True)
-            print(command)
-
-            # Check if the extraction was successful
-            if result.returncode == 0:
-                messagebox.showinfo("Success", f"Extraction successful! File saved at:\n{output_file_path}")
-            else:
-                messagebox.showerror("Error", f"{result.stderr}")
+        # Runs on a worker thread; extract_done reports the outcome
+        def extract(job):
+            backends.extract(carrier_path, password, output_file_path, 'mp3stego', run=job.run_command,
+                             progress=job.track, cancel=job)
+            return output_file_path
 
-        except Exception as e:
-            messagebox.showerror("Error", f"{e}")
+        job_runner.submit(f"Extract from {os.path.basename(carrier_path)}", extract, on_done=self.extract_done)
 
+    def extract_done(self, job):
+        if job.state == job_runner.DONE:
+            messagebox.showinfo("Success", f"Extraction successful! File saved at:\n{job.result}")
+        elif job.error:
+            messagebox.showerror("Error", f"{job.error}")
 
     def reset_hide_fields(self):
         self.carrier_entry.delete(0, ctk.END)
@@ -34,7 +34,7 @@
 #include "huffman.h"
 #include "stdlib.h"
      
-HUFFBITS dmask = 1 << (sizeof(HUFFBITS)*8-1);
+HUFFBITS dmask = (HUFFBITS)1 << (sizeof(HUFFBITS)*8-1);
 unsigned int hs = sizeof(HUFFBITS)*8;
 
 struct huffcodetab ht[HTN];	/* array of all huffcodtable headers	*/
@@ -1,6 +1,6 @@
 #include "bitstream.h"
 
-#define HUFFBITS unsigned long int
+#define HUFFBITS unsigned int   /* 32 bit code words, also on LP64 */
 #define HTN	34
 #define MXOFF	250
  
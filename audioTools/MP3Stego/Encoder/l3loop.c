@@ -140,6 +140,44 @@ void L3_loop_initialise()
 }
 
 
+/* MP3STEGO-> */
+/***************************************************************************/ 
+/* Once every value of a granule quantizes to zero the bit count no longer */
+/* changes with the step size, so a hidden bit whose parity does not match */
+/* would be searched for ever. Round the largest values up to 1 instead,   */
+/* one at a time, until the parity matches within max_bits.                */
+/***************************************************************************/ 
+static int round_up_for_bit(double xrs[576], int ix[576], gr_info *cod_info,
+                            int max_bits, int hiddenBit, int part2length)
+{
+    int tried[576];
+    int i, k, largest, bits;
+
+    for (i = 0; i < 576; i++) tried[i] = 0;
+    for (k = 0; k < 576; k++)
+    {
+        largest = -1;
+        for (i = 0; i < 576; i++)
+            if (!tried[i] && (largest < 0 || fabs(xrs[i]) > fabs(xrs[largest])))
+                largest = i;
+        if (xrs[largest] == 0.0) break;
+        tried[largest] = 1;
+
+        ix[largest] = 1;
+        calc_runlen(ix,cod_info);
+        bits = count1_bitcount(ix,cod_info);
+        subdivide(cod_info);
+        bigv_tab_select(ix,cod_info);
+        bits += bigv_bitcount(ix, cod_info);
+        if (bits <= max_bits && (bits + part2length) % 2 == hiddenBit) return bits;
+        ix[largest] = 0;
+    }
+    ERROR("inner_loop: no room for the hidden bit.");
+    return 0;
+}
+/* ->MP3STEGO */
+
+
 /***************************************************************************/ 
 /* The code selects the best quantizerStepSize for a particular set        */
 /* of scalefacs                                                            */
@@ -188,6 +226,11 @@ static int inner_loop(double xr[2][2][576],  int l3_enc[2][2][576],
 		default:
 			ERROR("inner_loop: unexpected hidden bit.");
 		}
+		if (embedRule && ix_max(ix,0,576) == 0)
+		{
+			bits = round_up_for_bit(xrs, ix, cod_info, max_bits, hiddenBit, part2length);
+			embedRule = 0;
+		}
 /* ->MP3STEGO */
     }
 /* MP3STEGO-> */
@@ -81,6 +81,8 @@ void L3_compress()
     memset((char*)snr32,0,sizeof(snr32));
     memset((char *)sam,0,sizeof(sam));
     memset((char *)&side_info,0,sizeof(L3_side_info_t));
+    /* The first frame reads the previous granule's subband samples */
+    memset((char *)l3_sb_sample,0,sizeof(l3_sb_sample));
 
     L3_psycho_initialise();
     L3_subband_initialise();
@@ -75,8 +75,9 @@
 typedef unsigned __int32  UINT32;
 typedef __int32      INT32;
 #else
-typedef unsigned long int UINT32;
-typedef long int     INT32;
+/* long is 64 bits on most other 64-bit platforms */
+typedef unsigned int UINT32;
+typedef int          INT32;
 #endif
 
 #ifndef TRUE
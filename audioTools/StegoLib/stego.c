@@ -78,8 +78,10 @@ static char pszTemp[256];              /* Name of temporary file that will*/
 char pszPassPhrase[MAX_LEN];           /* Passphrase for encryption and   */
                                        /* bit selection                   */
 static size_t nBufferIndex = 0;        /* Byte index within the buffer    */
-static size_t lData = 0;               /* Length of hidden data after     */
-                                       /* compression and encryption      */
+static unsigned int lData = 0;         /* Length of hidden data after     */
+                                       /* compression and encryption,     */
+                                       /* stored as 4 bytes like the      */
+                                       /* 32-bit Windows builds do        */
 
 /* STEGO */
 #if defined(_DEBUG)
@@ -0,0 +1,523 @@
+/*--------------------------------------------------------------------
+ *
+ * In-process entry points for the MP3Stego encoder and decoder.
+ *
+ * The console programs are run unchanged through their renamed main().
+ * Inputs and outputs are passed as memory buffers, see mp3stego_lib.h
+ * for how file access, exit() and console output are redirected.
+ *
+ * The original code keeps its state in static variables and expects a
+ * fresh process for every run. The writable data segment of this
+ * library is therefore copied before the first run and restored at the
+ * start of every later one. Runs are not reentrant: callers must not
+ * enter the same library from two threads at once.
+ *
+ * Built twice, with MP3STEGO_ENCODER for the encoder library and with
+ * MP3STEGO_DECODER for the decoder library (see Makefile).
+ *
+ *--------------------------------------------------------------------
+ */
+#define _GNU_SOURCE
+#include <errno.h>
+#include <link.h>
+#include <setjmp.h>
+#include <stddef.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/stat.h>
+
+#define EXPORT __attribute__((visibility("default")))
+
+#define MEMORY_PREFIX "mem:"
+#define NULL_FILE "mem:null"
+#define MAX_MEMORY_FILES 16
+#define MAX_OPEN_FILES 32
+#define MAX_NAME 64
+#define EXIT_BASE 0x100
+
+#if defined(MP3STEGO_ENCODER)
+int mp3stego_main(int argc, char **argv);
+#elif defined(MP3STEGO_DECODER)
+void mp3stego_main(int argc, char **argv);
+#else
+#error "Define MP3STEGO_ENCODER or MP3STEGO_DECODER"
+#endif
+
+typedef struct {
+    char name[MAX_NAME];
+    char *data;
+    size_t size;
+    int owned;                 /* data belongs to the library */
+} memory_file_t;
+
+/* Header placed in front of every block handed out to the MP3Stego code */
+typedef union allocation {
+    struct {
+        union allocation *prev;
+        union allocation *next;
+    } links;
+    max_align_t align;
+} allocation_t;
+
+FILE *mp3stego_console = NULL;
+
+static memory_file_t memory_files[MAX_MEMORY_FILES];
+static FILE *open_files[MAX_OPEN_FILES];
+static allocation_t allocations;
+static jmp_buf exit_point;
+static char tables_dir[1024];
+static char temp_name[L_tmpnam];
+static int temp_count;
+static char *console_data;
+static size_t console_size;
+static char error_message[512];
+
+static unsigned char *segment_start;
+static unsigned char *segment_image;
+static size_t segment_size;
+
+/*---------------------------------------------------------------------------
+ * Data segment snapshot
+ *---------------------------------------------------------------------------
+ */
+static int find_segment(struct dl_phdr_info *info, size_t size, void *marker)
+{
+    uintptr_t address = (uintptr_t)marker, start = 0, end = 0, relro_end = 0;
+    int i;
+
+    for (i = 0; i < info->dlpi_phnum; i++)
+    {
+        const ElfW(Phdr) *header = &info->dlpi_phdr[i];
+        uintptr_t low = info->dlpi_addr + header->p_vaddr;
+        uintptr_t high = low + header->p_memsz;
+
+        if (header->p_type == PT_LOAD && (header->p_flags & PF_W) && address >= low && address < high)
+        {
+            start = low;
+            end = high;
+        }
+        else if (header->p_type == PT_GNU_RELRO)
+            relro_end = high;
+    }
+    if (end == 0)
+        return 0;
+
+    /* The relocation read-only part is write protected once loaded */
+    if (relro_end > start && relro_end < end)
+        start = relro_end;
+    segment_start = (unsigned char *)start;
+    segment_size = end - start;
+    return 1;
+}
+
+static int reset_segment(void)
+{
+    if (segment_image == NULL)
+    {
+        if (!dl_iterate_phdr(find_segment, &segment_size))
+            return -1;
+        segment_image = malloc(segment_size);
+        if (segment_image == NULL)
+            return -1;
+        memcpy(segment_image, segment_start, segment_size);
+        return 0;
+    }
+    memcpy(segment_start, segment_image, segment_size);
+    return 0;
+}
+
+/*---------------------------------------------------------------------------
+ * Memory files
+ *---------------------------------------------------------------------------
+ */
+static int is_memory_name(const char *name)
+{
+    return strncmp(name, MEMORY_PREFIX, strlen(MEMORY_PREFIX)) == 0;
+}
+
+static memory_file_t *find_memory_file(const char *name)
+{
+    int i;
+    for (i = 0; i < MAX_MEMORY_FILES; i++)
+        if (strcmp(memory_files[i].name, name) == 0)
+            return &memory_files[i];
+    return NULL;
+}
+
+static void drop_memory_file(memory_file_t *entry)
+{
+    if (entry->owned)
+        free(entry->data);
+    memset(entry, 0, sizeof(*entry));
+}
+
+static memory_file_t *create_memory_file(const char *name)
+{
+    memory_file_t *entry = find_memory_file(name);
+    if (entry == NULL)
+        entry = find_memory_file("");
+    if (entry == NULL || strlen(name) >= MAX_NAME)
+        return NULL;
+    drop_memory_file(entry);
+    strcpy(entry->name, name);
+    return entry;
+}
+
+static int add_memory_file(const char *name, const unsigned char *data, size_t size)
+{
+    memory_file_t *entry = create_memory_file(name);
+    if (entry == NULL)
+        return -1;
+    entry->data = (char *)data;
+    entry->size = size;
+    return 0;
+}
+
+/* Hand the contents of a memory file over to the caller */
+static int take_memory_file(const char *name, unsigned char **data, size_t *size)
+{
+    memory_file_t *entry = find_memory_file(name);
+    if (entry == NULL)
+        return -1;
+
+    if (entry->owned)
+    {
+        *data = (unsigned char *)entry->data;
+        entry->owned = 0;
+    }
+    else
+    {
+        *data = malloc(entry->size ? entry->size : 1);
+        if (*data == NULL)
+            return -1;
+        memcpy(*data, entry->data, entry->size);
+    }
+    *size = entry->size;
+    return 0;
+}
+
+static FILE *track_file(FILE *file)
+{
+    int i;
+    if (file == NULL)
+        return NULL;
+    for (i = 0; i < MAX_OPEN_FILES; i++)
+        if (open_files[i] == NULL)
+        {
+            open_files[i] = file;
+            return file;
+        }
+    fclose(file);
+    errno = EMFILE;
+    return NULL;
+}
+
+FILE *mp3stego_fopen(const char *name, const char *mode)
+{
+    memory_file_t *entry;
+    char path[sizeof(tables_dir) + MAX_NAME];
+
+    if (strcmp(name, NULL_FILE) == 0)
+        return track_file(fopen("/dev/null", mode));
+
+    if (is_memory_name(name))
+    {
+        if (mode[0] == 'r')
+        {
+            entry = find_memory_file(name);
+            if (entry == NULL)
+            {
+                errno = ENOENT;
+                return NULL;
+            }
+            if (entry->size == 0)
+                return track_file(fopen("/dev/null", "rb"));
+            return track_file(fmemopen(entry->data, entry->size, "rb"));
+        }
+
+        entry = create_memory_file(name);
+        if (entry == NULL)
+        {
+            errno = ENFILE;
+            return NULL;
+        }
+        entry->owned = 1;
+        return track_file(open_memstream(&entry->data, &entry->size));
+    }
+
+    /* Only the decoder tables are read from disk */
+    if (name[0] != '/' && tables_dir[0] != '\0')
+    {
+        snprintf(path, sizeof(path), "%s/%s", tables_dir, name);
+        return track_file(fopen(path, mode));
+    }
+    return track_file(fopen(name, mode));
+}
+
+int mp3stego_fclose(FILE *file)
+{
+    int i;
+    for (i = 0; i < MAX_OPEN_FILES; i++)
+        if (open_files[i] == file)
+            open_files[i] = NULL;
+    return fclose(file);
+}
+
+int mp3stego_remove(const char *name)
+{
+    memory_file_t *entry;
+
+    if (!is_memory_name(name))
+        return remove(name);
+    entry = find_memory_file(name);
+    if (entry == NULL)
+    {
+        errno = ENOENT;
+        return -1;
+    }
+    drop_memory_file(entry);
+    return 0;
+}
+
+int mp3stego_stat(const char *name, struct stat *buf)
+{
+    memory_file_t *entry;
+
+    if (!is_memory_name(name))
+        return stat(name, buf);
+    entry = find_memory_file(name);
+    if (entry == NULL)
+    {
+        errno = ENOENT;
+        return -1;
+    }
+    memset(buf, 0, sizeof(*buf));
+    buf->st_size = entry->size;
+    return 0;
+}
+
+/* Temporary files are memory files too; the caller appends an extension */
+char *mp3stego_tmpnam(char *buf)
+{
+    char *name = buf ? buf : temp_name;
+    snprintf(name, L_tmpnam, MEMORY_PREFIX "temp%d.", ++temp_count);
+    return name;
+}
+
+/*---------------------------------------------------------------------------
+ * Tracked allocations
+ *---------------------------------------------------------------------------
+ */
+static void link_allocation(allocation_t *block)
+{
+    block->links.prev = &allocations;
+    block->links.next = allocations.links.next;
+    allocations.links.next->links.prev = block;
+    allocations.links.next = block;
+}
+
+static void unlink_allocation(allocation_t *block)
+{
+    block->links.prev->links.next = block->links.next;
+    block->links.next->links.prev = block->links.prev;
+}
+
+/* Blocks are zeroed: parts of the code read buffers before writing them and
+   only behave the same as a fresh process when they start out as zeros */
+void *mp3stego_malloc(size_t size)
+{
+    allocation_t *block = calloc(1, sizeof(allocation_t) + size);
+    if (block == NULL)
+        return NULL;
+    link_allocation(block);
+    return block + 1;
+}
+
+void *mp3stego_calloc(size_t count, size_t size)
+{
+    if (size && count > SIZE_MAX / size)
+        return NULL;
+    return mp3stego_malloc(count * size);
+}
+
+void *mp3stego_realloc(void *ptr, size_t size)
+{
+    allocation_t *block, *moved;
+
+    if (ptr == NULL)
+        return mp3stego_malloc(size);
+    block = (allocation_t *)ptr - 1;
+    unlink_allocation(block);
+    moved = realloc(block, sizeof(allocation_t) + size);
+    if (moved == NULL)
+    {
+        link_allocation(block);
+        return NULL;
+    }
+    link_allocation(moved);
+    return moved + 1;
+}
+
+void mp3stego_free(void *ptr)
+{
+    allocation_t *block;
+    if (ptr == NULL)
+        return;
+    block = (allocation_t *)ptr - 1;
+    unlink_allocation(block);
+    free(block);
+}
+
+void mp3stego_exit(int status)
+{
+    longjmp(exit_point, status + EXIT_BASE);
+}
+
+/*---------------------------------------------------------------------------
+ * Runs
+ *---------------------------------------------------------------------------
+ */
+static int begin(const char *tables)
+{
+    if (reset_segment() != 0)
+        return -1;
+    allocations.links.prev = allocations.links.next = &allocations;
+    if (tables)
+        snprintf(tables_dir, sizeof(tables_dir), "%s", tables);
+    mp3stego_console = open_memstream(&console_data, &console_size);
+    return mp3stego_console ? 0 : -1;
+}
+
+/* Keep the last line the program printed, usually the reason it stopped */
+static void keep_error_message(void)
+{
+    char *end = console_data + console_size, *start;
+
+    while (end > console_data && (end[-1] == '\n' || end[-1] == '\r' || end[-1] == ' '))
+        end--;
+    start = end;
+    while (start > console_data && start[-1] != '\n' && start[-1] != '\r')
+        start--;
+    snprintf(error_message, sizeof(error_message), "%.*s", (int)(end - start), start);
+}
+
+static void finish(int status)
+{
+    int i;
+
+    for (i = 0; i < MAX_OPEN_FILES; i++)
+        if (open_files[i])
+        {
+            fclose(open_files[i]);
+            open_files[i] = NULL;
+        }
+    for (i = 0; i < MAX_MEMORY_FILES; i++)
+        drop_memory_file(&memory_files[i]);
+    while (allocations.links.next != &allocations)
+        mp3stego_free(allocations.links.next + 1);
+
+    fclose(mp3stego_console);
+    mp3stego_console = NULL;
+    if (status != 0)
+        keep_error_message();
+    free(console_data);
+    console_data = NULL;
+}
+
+static int run(int argc, char **argv)
+{
+    int status = setjmp(exit_point);
+    if (status == 0)
+    {
+#if defined(MP3STEGO_ENCODER)
+        status = mp3stego_main(argc, argv) + EXIT_BASE;
+#else
+        mp3stego_main(argc, argv);
+        status = EXIT_BASE;
+#endif
+    }
+    return status - EXIT_BASE;
+}
+
+EXPORT const char *mp3stego_error(void)
+{
+    return error_message;
+}
+
+EXPORT void mp3stego_release(void *data)
+{
+    free(data);
+}
+
+#if defined(MP3STEGO_ENCODER)
+
+/* Encode the WAV file in `wav` to MP3, hiding `secret` when it is not NULL */
+EXPORT int mp3stego_encode(const unsigned char *wav, size_t wav_size,
+                           const unsigned char *secret, size_t secret_size,
+                           const char *password, int bitrate,
+                           unsigned char **mp3, size_t *mp3_size)
+{
+    char bitrate_text[16];
+    char *argv[10];
+    int argc = 0, status;
+
+    if (begin(NULL) != 0)
+        return -1;
+    snprintf(bitrate_text, sizeof(bitrate_text), "%d", bitrate);
+
+    argv[argc++] = "encode";
+    argv[argc++] = "-b";
+    argv[argc++] = bitrate_text;
+    if (secret)
+    {
+        argv[argc++] = "-E";
+        argv[argc++] = MEMORY_PREFIX "secret";
+        argv[argc++] = "-P";
+        argv[argc++] = (char *)password;
+    }
+    argv[argc++] = MEMORY_PREFIX "input.wav";
+    argv[argc++] = MEMORY_PREFIX "output.mp3";
+    argv[argc] = NULL;
+
+    status = add_memory_file(MEMORY_PREFIX "input.wav", wav, wav_size);
+    if (status == 0 && secret)
+        status = add_memory_file(MEMORY_PREFIX "secret", secret, secret_size);
+    if (status == 0)
+        status = run(argc, argv);
+    if (status == 0)
+        status = take_memory_file(MEMORY_PREFIX "output.mp3", mp3, mp3_size);
+
+    finish(status);
+    return status;
+}
+
+#else
+
+/* Decode the MP3 file in `mp3` and return the data hidden in it. The
+   decoded samples are discarded. */
+EXPORT int mp3stego_decode(const unsigned char *mp3, size_t mp3_size,
+                           const char *password, const char *tables,
+                           unsigned char **secret, size_t *secret_size)
+{
+    char *argv[] = {
+        "decode", "-X", "-P", (char *)password,
+        MEMORY_PREFIX "input.mp3", NULL_FILE, MEMORY_PREFIX "hidden", NULL
+    };
+    int status;
+
+    if (begin(tables) != 0)
+        return -1;
+
+    status = add_memory_file(MEMORY_PREFIX "input.mp3", mp3, mp3_size);
+    if (status == 0)
+        status = run(7, argv);
+    if (status == 0)
+        status = take_memory_file(MEMORY_PREFIX "hidden", secret, secret_size);
+
+    finish(status);
+    return status;
+}
+
+#endif
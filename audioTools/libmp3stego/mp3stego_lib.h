@@ -0,0 +1,65 @@
+/*--------------------------------------------------------------------
+ *
+ * Force-included (gcc -include) into every MP3Stego, StegoLib and zlib
+ * source file when building the in-process library. It redirects the
+ * few C library calls that assume a whole process, without touching
+ * the sources:
+ *
+ *   fopen/fclose/remove/stat/tmpnam  named files starting with "mem:"
+ *                                    live in memory, table files are
+ *                                    looked up in the tables directory
+ *   malloc/calloc/realloc/free       tracked, so everything left over
+ *                                    after an error is released
+ *   exit/abort                       return to the library entry point
+ *   printf/stdout/stderr             captured, the last error message
+ *                                    is reported to the caller
+ *   main                             renamed so the library can call it
+ *
+ *--------------------------------------------------------------------
+ */
+#ifndef MP3STEGO_LIB_H
+#define MP3STEGO_LIB_H
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/types.h>
+#include <sys/stat.h>
+
+FILE *mp3stego_fopen(const char *name, const char *mode);
+int mp3stego_fclose(FILE *file);
+int mp3stego_remove(const char *name);
+int mp3stego_stat(const char *name, struct stat *buf);
+char *mp3stego_tmpnam(char *buf);
+void *mp3stego_malloc(size_t size);
+void *mp3stego_calloc(size_t count, size_t size);
+void *mp3stego_realloc(void *ptr, size_t size);
+void mp3stego_free(void *ptr);
+void mp3stego_exit(int status) __attribute__((noreturn));
+extern FILE *mp3stego_console;
+
+#define fopen(name, mode) mp3stego_fopen(name, mode)
+#define fclose(file) mp3stego_fclose(file)
+#define remove(name) mp3stego_remove(name)
+#define stat(name, buf) mp3stego_stat(name, buf)
+#define tmpnam(buf) mp3stego_tmpnam(buf)
+#define malloc(size) mp3stego_malloc(size)
+#define calloc(count, size) mp3stego_calloc(count, size)
+#define realloc(ptr, size) mp3stego_realloc(ptr, size)
+#define free(ptr) mp3stego_free(ptr)
+#define exit(status) mp3stego_exit(status)
+#define abort() mp3stego_exit(EXIT_FAILURE)
+
+#undef stdout
+#undef stderr
+#define stdout mp3stego_console
+#define stderr mp3stego_console
+#define printf(...) fprintf(mp3stego_console, __VA_ARGS__)
+
+#define main mp3stego_main
+
+/* The console build reads the passphrase from the keyboard when -P is
+   missing; the library always passes one */
+#define GETCHAR EOF
+
+#endif
@@ -0,0 +1,155 @@
+import os
+import shutil
+import hashlib
+import time
+import numpy as np
+from wavfile import parse_wav, open_data, low_bytes
+from lsb_core import embed_lanes, segments_end, bits_before, prepare_payload, plan_segments, extract_from_lanes
+from progress import Clock, check, drive
+from metrics import span, count
+
+def generate_hashed_filename():
+    timestamp = str(time.time()).encode()
+    return hashlib.sha256(timestamp).hexdigest()[:10]
+
+# Frames per block when streaming a carrier, and buffer size for copying the tail
+BLOCK_FRAMES = 64 * 1024
+COPY_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Split the raw bytes of whole frames, starting at frame `first_frame`, into
+# (low byte view, first sample index) lanes in the given sample order
+def sample_lanes(data, info, layout, first_frame=0):
+    low = low_bytes(data, info)
+    if layout == 'interleaved':
+        return [(low, first_frame * info.channels)]
+    channels = info.channels
+    return [(low[c::channels], c * info.nframes + first_frame) for c in range(channels)]
+
+# Number of leading frames that hold the first `end` samples of the sequence
+def frames_touched(end, info, layout):
+    if layout == 'interleaved':
+        return -(-end // info.channels)
+    return min(end, info.nframes)
+
+# Copy the carrier block by block, embedding the symbols that fall in each block.
+# Once the payload is written the untouched tail is copied with large buffered
+# reads, so memory use depends on the block size and not on the carrier length.
+def stream_steps(audio_file, output_file, info, segments, layout, block_frames=BLOCK_FRAMES, cancel=None):
+    frame_size = info.sampwidth * info.channels
+    end_frame = frames_touched(segments_end(segments), info, layout)
+    buffer = bytearray(block_frames * frame_size)
+    clock = Clock(end_frame * frame_size)
+
+    with open(audio_file, 'rb') as src, open(output_file, 'wb') as dst:
+        dst.write(src.read(info.data_offset))
+
+        # Never read past the frames that hold the payload, so trailing chunks
+        # after the sample data are only ever copied
+        frame = 0
+        while frame < end_frame:
+            check(cancel)
+            frames = min(block_frames, end_frame - frame)
+            with span('read'):
+                size = src.readinto(memoryview(buffer)[:frames * frame_size])
+            if size < frames * frame_size:
+                raise ValueError("Audio file ended before its declared sample data.")
+            block = np.frombuffer(buffer, dtype=np.uint8, count=size)
+            with span('embed'):
+                embed_lanes(sample_lanes(block, info, layout, frame), segments)
+            with span('write'):
+                dst.write(memoryview(buffer)[:size])
+            frame += frames
+            yield clock.progress(frame * frame_size, bits_written(segments, info, layout, frame))
+
+        with span('write'):
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+# Embed by copying the carrier and writing the symbols straight into a memory map
+# of the copy; only the pages holding the payload are ever read or written.
+def mmap_steps(audio_file, output_file, info, segments, layout, block_frames=BLOCK_FRAMES, cancel=None):
+    frame_size = info.sampwidth * info.channels
+    end_frame = frames_touched(segments_end(segments), info, layout)
+    clock = Clock(end_frame * frame_size)
+    with span('write'):
+        shutil.copyfile(audio_file, output_file)
+    data = open_data(output_file, 'r+', info)
+    try:
+        for frame in range(0, end_frame, block_frames):
+            check(cancel)
+            last = min(frame + block_frames, end_frame)
+            with span('embed'):
+                embed_lanes(sample_lanes(data[frame * frame_size:last * frame_size], info, layout, frame), segments)
+            yield clock.progress(last * frame_size, bits_written(segments, info, layout, last))
+        with span('write'):
+            data.flush()
+    finally:
+        del data
+
+# Payload bits written once the first `frames` frames are done
+def bits_written(segments, info, layout, frames):
+    if layout == 'interleaved' or frames >= info.nframes:
+        return bits_before(segments, frames * info.channels)
+    # In channel order the block holds the start of each channel's run
+    return sum(bits_before(segments, c * info.nframes + frames) - bits_before(segments, c * info.nframes)
+               for c in range(info.channels))
+
+# Number of samples (frames x channels) in a WAV file, read from its header only
+def sample_count(audio_file):
+    info = parse_wav(audio_file)
+    return info.nframes * info.channels
+
+# Embed as steps (see progress.py) yielding the carrier bytes and payload
+# bits done after each block of `block_frames` frames; `cancel` stops it
+# between blocks and removes the partial output. Options are those of
+# lsb_core.prepare_payload and plan_segments. `layout` picks the sample order,
+# see lsb_core.LAYOUTS, and `scatter` spreads the payload over the whole
+# carrier at passphrase-keyed positions. `mode` is 'mmap' or 'stream'.
+def embed_steps(audio_file, message_file, passphrase, output_file, depth=None, layout='interleaved',
+                compression='auto', scatter=False, mode='mmap', block_frames=BLOCK_FRAMES, cancel=None):
+    if mode not in ('mmap', 'stream'):
+        raise ValueError(f"Unknown embedding mode: {mode}")
+    payload, codec = prepare_payload(message_file, compression)
+    with span('parse'):
+        info = parse_wav(audio_file)
+    segments = plan_segments(payload, codec, passphrase, info.nframes * info.channels, depth, layout, scatter)
+
+    steps = mmap_steps if mode == 'mmap' else stream_steps
+    try:
+        yield from steps(audio_file, output_file, info, segments, layout, block_frames, cancel)
+    except BaseException:
+        # Cancelled or failed part way: leave no half-embedded file behind
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        raise
+    count('bits_embedded', sum(len(segment.symbols) * segment.depth for segment in segments))
+    return output_file
+
+# embed_steps run to the end
+def embed_file(audio_file, message_file, passphrase, output_file, **options):
+    return drive(embed_steps(audio_file, message_file, passphrase, output_file, **options))
+
+# Embed into a new, uniquely named WAV file in `output_dir`; see embed_file for the options
+def encode_message(audio_file, message_file, passphrase, output_dir, **options):
+    output_file = os.path.join(output_dir, f"{generate_hashed_filename()}.wav")
+    return embed_file(audio_file, message_file, passphrase, output_file, **options)
+
+# Recover the hidden message as a memoryview over the extracted bits. The
+# samples are memory mapped, so only the header and the payload it describes
+# are paged in from the file.
+def extract_payload(audio_file, passphrase):
+    with span('parse'):
+        info = parse_wav(audio_file)
+    data = open_data(audio_file, 'r', info)
+    with span('extract'):
+        return extract_from_lanes(lambda layout: sample_lanes(data, info, layout),
+                                  info.nframes * info.channels, passphrase)
+
+def decode_message(audio_file, passphrase):
+    return bytes(extract_payload(audio_file, passphrase))
+
+# Write the hidden message straight from the extracted bits to `output_file`
+def decode_to_file(audio_file, passphrase, output_file):
+    message = extract_payload(audio_file, passphrase)
+    with span('write'), open(output_file, 'wb') as file:
+        file.write(message)
+    return output_file
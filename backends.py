@@ -0,0 +1,354 @@
+import os
+import json
+import time
+import zlib
+import threading
+import audio_lsb
+import bmp_lsb
+import capacity
+import embed_cache
+import lsb_core
+import metrics
+import mp3stego_lib
+import mp3stego_tool
+import steghide_tool
+import tool_registry
+from capacity import CACHE_DIR
+from progress import call_steps, drive
+from wavfile import parse_wav
+
+# One interface over the steganography engines, so the GUI tabs and the batch
+# tools call the same API. Each backend has embed_steps/extract_steps with the
+# arguments of the engines plus `run` (see steghide_tool.steghide_steps) and
+# `cancel` (see progress.py), embed/extract running them to the end, capacity()
+# and cost_estimate(). With backend='auto', embed() picks the available backend
+# with the lowest estimated cost that takes the carrier format and holds the
+# secret; extract() tries the backends that read the format, cheapest first.
+#
+# embed() and extract() write a metrics line per job when metrics are on,
+# see metrics.py.
+#
+# Costs are modelled as fixed + per_mb * carrier megabytes. The models start
+# from rough defaults and are refitted from the measured times of real runs,
+# kept in cache/costs.json.
+COSTS_PATH = os.path.join(CACHE_DIR, 'costs.json')
+COST_SAMPLES = 50
+MB = 1024 * 1024
+
+class Backend:
+    name = None
+    formats = ()           # carrier formats it embeds into
+    output_format = None   # format of the stego file; None keeps the carrier's
+    default_cost = (0.1, 1.0)  # (fixed seconds, seconds per carrier MB)
+
+    def available(self, action='embed'):
+        return True
+
+    # Stego file formats it extracts from
+    def stego_formats(self):
+        return (self.output_format,) if self.output_format else self.formats
+
+    # Bytes the carrier can hold, an upper bound for some backends
+    def capacity(self, carrier_path):
+        raise NotImplementedError
+
+    # Bytes the secret takes once embedded, at the least
+    def needed(self, secret_path, limit=None):
+        return capacity.embedded_size(secret_path, limit)
+
+    def cost_estimate(self, carrier_path, secret_path=None, action='embed'):
+        fixed, per_mb = cost_model(self.name, action, self.default_cost)
+        return fixed + per_mb * os.path.getsize(carrier_path) / MB
+
+    # `progress` is called with each progress.Progress of the steps
+    def embed(self, carrier_path, secret_path, password, output_path, run=None, progress=None, cancel=None,
+              **options):
+        steps = self.embed_steps(carrier_path, secret_path, password, output_path, run=run, cancel=cancel, **options)
+        return drive(steps, progress)
+
+    def extract(self, carrier_path, password, output_path, run=None, progress=None, cancel=None):
+        return drive(self.extract_steps(carrier_path, password, output_path, run=run, cancel=cancel), progress)
+
+class SteghideBackend(Backend):
+    name = 'steghide'
+    formats = ('jpeg', 'bmp', 'wav', 'au')
+    default_cost = (0.2, 2.0)
+
+    def available(self, action='embed'):
+        return tool_registry.available('steghide')
+
+    def capacity(self, carrier_path):
+        return capacity.carrier_capacity(carrier_path).bytes
+
+    def embed_steps(self, carrier_path, secret_path, password, output_path, run=None, cancel=None):
+        return steghide_tool.embed_steps(carrier_path, secret_path, password, output_path, run=run, cancel=cancel)
+
+    def extract_steps(self, carrier_path, password, output_path, run=None, cancel=None):
+        return steghide_tool.extract_steps(carrier_path, password, output_path, run=run, cancel=cancel)
+
+# Payload bytes at the deepest bit depth the LSB engines use, once the
+# header (HEADER_SIZE bytes, one bit per sample) is taken off
+def lsb_capacity(samples):
+    return max(samples - lsb_core.HEADER_SIZE * 8, 0) * lsb_core.MAX_DEPTH // 8
+
+# The payload exactly as the LSB engines build it, so a secret that
+# compresses too little to be worth it is counted at its raw size
+def lsb_needed(secret_path):
+    payload, _ = lsb_core.prepare_payload(secret_path)
+    return len(payload)
+
+class WavLsbBackend(Backend):
+    name = 'lsb'
+    formats = ('wav',)
+    default_cost = (0.1, 0.02)
+
+    def capacity(self, carrier_path):
+        return lsb_capacity(audio_lsb.sample_count(carrier_path))
+
+    def needed(self, secret_path, limit=None):
+        return lsb_needed(secret_path)
+
+    def embed_steps(self, carrier_path, secret_path, password, output_path, run=None, cancel=None, **options):
+        return audio_lsb.embed_steps(carrier_path, secret_path, password, output_path, cancel=cancel, **options)
+
+    # Extraction only reads the samples of the payload, in one call
+    def extract_steps(self, carrier_path, password, output_path, run=None, cancel=None):
+        return call_steps(cancel, audio_lsb.decode_to_file, carrier_path, password, output_path)
+
+class BmpLsbBackend(Backend):
+    name = 'bmp'
+    formats = ('bmp',)
+    default_cost = (0.1, 0.02)
+
+    def capacity(self, carrier_path):
+        return lsb_capacity(bmp_lsb.sample_count(bmp_lsb.parse_bmp(carrier_path)))
+
+    def needed(self, secret_path, limit=None):
+        return lsb_needed(secret_path)
+
+    def embed_steps(self, carrier_path, secret_path, password, output_path, run=None, cancel=None, **options):
+        return bmp_lsb.embed_steps(carrier_path, secret_path, password, output_path, cancel=cancel, **options)
+
+    def extract_steps(self, carrier_path, password, output_path, run=None, cancel=None):
+        return call_steps(cancel, bmp_lsb.decode_to_file, carrier_path, password, output_path)
+
+# gzip header and trailer, and cipher block size of MP3Stego's framing
+MP3STEGO_GZIP_OVERHEAD = 18
+MP3STEGO_BLOCK = 8
+
+# MP3Stego encodes the WAV carrier to MP3; through the shared libraries
+# when they are built (one call in a worker process, killed on cancel), else
+# through Encode.exe/Decode.exe
+class Mp3StegoBackend(Backend):
+    name = 'mp3stego'
+    formats = ('wav',)
+    output_format = 'mp3'
+    default_cost = (0.1, 1.5)
+
+    def available(self, action='embed'):
+        return mp3stego_lib.available() or tool_registry.available('encode' if action == 'embed' else 'decode')
+
+    # The encoder offers one bit per granule and channel, and its
+    # pseudo-random selection uses about half of them; 4 bytes hold the length
+    def capacity(self, carrier_path):
+        info = parse_wav(carrier_path)
+        bits = info.nframes // 1152 * 2 * info.channels
+        return max(bits // 16 - 4, 0)
+
+    # MP3Stego gzips the secret at zlib's default level (a 10 byte header and
+    # an 8 byte trailer around the deflate data), then encrypts it with 3DES
+    # in 8 byte blocks, padding with 1 to 8 bytes. The length word is already
+    # taken off capacity().
+    def needed(self, secret_path, limit=None):
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+        size = MP3STEGO_GZIP_OVERHEAD
+        with open(secret_path, 'rb') as file:
+            while chunk := file.read(capacity.COMPRESS_CHUNK):
+                size += len(compressor.compress(chunk))
+                if limit is not None and size > limit:
+                    return size
+        size += len(compressor.flush())
+        return (size // MP3STEGO_BLOCK + 1) * MP3STEGO_BLOCK
+
+    def embed_steps(self, carrier_path, secret_path, password, output_path, run=None, cancel=None):
+        if mp3stego_lib.available():
+            return call_steps(cancel, mp3stego_lib.embed, carrier_path, secret_path, password, output_path,
+                              mp3stego_lib.DEFAULT_BITRATE, cancel)
+        return mp3stego_tool.embed_steps(carrier_path, secret_path, password, output_path, run=run, cancel=cancel)
+
+    def extract_steps(self, carrier_path, password, output_path, run=None, cancel=None):
+        if mp3stego_lib.available():
+            return call_steps(cancel, mp3stego_lib.extract, carrier_path, password, output_path, cancel)
+        return mp3stego_tool.extract_steps(carrier_path, password, output_path, run=run, cancel=cancel)
+
+BACKENDS = {backend.name: backend for backend in (
+    SteghideBackend(), WavLsbBackend(), BmpLsbBackend(), Mp3StegoBackend(),
+)}
+
+def get(name):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}")
+    return BACKENDS[name]
+
+costs_lock = threading.Lock()
+
+def load_costs():
+    try:
+        with open(COSTS_PATH) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+# Least-squares line through the recorded (carrier MB, seconds) samples;
+# `default` until the samples span more than one carrier size
+def cost_model(name, action, default):
+    samples = load_costs().get(f"{name}/{action}", [])
+    if len({size for size, _ in samples}) < 2:
+        return default
+    count = len(samples)
+    mean_size = sum(size for size, _ in samples) / count
+    mean_time = sum(seconds for _, seconds in samples) / count
+    spread = sum((size - mean_size) ** 2 for size, _ in samples)
+    per_mb = sum((size - mean_size) * (seconds - mean_time) for size, seconds in samples) / spread
+    per_mb = max(per_mb, 0.0)
+    return max(mean_time - per_mb * mean_size, 0.0), per_mb
+
+# Measured runs not yet recorded, as (name, action, carrier MB, seconds).
+# batch.py sets this to a list in its worker processes, which would
+# otherwise overwrite each other's cache/costs.json, and records the samples
+# from the parent process; None records each run as it finishes.
+pending_costs = None
+
+# Add a measured run to the cost model of a backend
+def record(name, action, carrier_path, seconds):
+    sample = (name, action, os.path.getsize(carrier_path) / MB, seconds)
+    if pending_costs is not None:
+        pending_costs.append(sample)
+    else:
+        record_samples([sample])
+
+def record_samples(samples):
+    if not samples:
+        return
+    with costs_lock:
+        costs = load_costs()
+        for name, action, size, seconds in samples:
+            kept = costs.setdefault(f"{name}/{action}", [])
+            kept.append((size, seconds))
+            del kept[:-COST_SAMPLES]
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_path = f"{COSTS_PATH}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w') as file:
+                json.dump(costs, file)
+            os.replace(temp_path, COSTS_PATH)
+        except OSError:
+            # The model only steers the choice of backend
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+# Backends able to embed `secret_path` in `carrier_path`, cheapest first.
+# `output_format` is the stego file format wanted, the carrier's by default.
+def embed_candidates(carrier_path, secret_path, output_format=None):
+    carrier_format = capacity.file_format(carrier_path)
+    output_format = output_format or carrier_format
+    ranked = []
+    for backend in BACKENDS.values():
+        if carrier_format not in backend.formats or (backend.output_format or carrier_format) != output_format:
+            continue
+        if not backend.available('embed'):
+            continue
+        try:
+            room = backend.capacity(carrier_path)
+        except (OSError, ValueError):
+            continue
+        if backend.needed(secret_path, room) <= room:
+            ranked.append((backend.cost_estimate(carrier_path, secret_path), backend.name))
+    return [BACKENDS[name] for _, name in sorted(ranked)]
+
+def extract_candidates(carrier_path):
+    stego_format = capacity.file_format(carrier_path)
+    ranked = [(backend.cost_estimate(carrier_path, action='extract'), backend.name)
+              for backend in BACKENDS.values()
+              if stego_format in backend.stego_formats() and backend.available('extract')]
+    return [BACKENDS[name] for _, name in sorted(ranked)]
+
+def pick(carrier_path, secret_path, output_format=None):
+    candidates = embed_candidates(carrier_path, secret_path, output_format)
+    if not candidates:
+        raise ValueError("No available backend can hide this secret in this carrier.")
+    return candidates[0]
+
+def timed(backend, action, carrier_path, function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    record(backend.name, action, carrier_path, time.perf_counter() - start)
+    return result
+
+# Byte counts of a job's files for its metrics line, only looked up when
+# metrics are recorded
+def count_files(**paths):
+    if metrics.current():
+        for name, path in paths.items():
+            metrics.count(f"{name}_bytes", os.path.getsize(path))
+
+# Hide `secret_path` in `carrier_path` and write the stego file to
+# `output_path`. Returns the name of the backend used. Identical jobs are
+# served from embed_cache. `progress` and `cancel` are those of Backend.embed.
+# `output_format` is the stego file format wanted (see embed_candidates); a
+# named backend that writes another one raises ValueError.
+def embed(carrier_path, secret_path, password, output_path, backend='auto', run=None, output_format=None,
+          progress=None, cancel=None, **options):
+    with metrics.job('embed', requested=backend):
+        count_files(carrier=carrier_path, secret=secret_path)
+        with metrics.span('dispatch'):
+            if backend == 'auto':
+                chosen = pick(carrier_path, secret_path, output_format)
+            else:
+                chosen = get(backend)
+                produced = chosen.output_format or capacity.file_format(carrier_path)
+                if output_format and output_format != produced:
+                    raise ValueError(f"The {chosen.name} backend writes {produced} files, not {output_format}.")
+                room = chosen.capacity(carrier_path)
+                needed = chosen.needed(secret_path, room)
+                if needed > room:
+                    raise ValueError(f"The secret file is too large for this carrier: it needs at least "
+                                     f"{needed} bytes but the carrier holds at most {room} bytes.")
+        metrics.note(backend=chosen.name)
+
+        def run_backend(carrier_path, secret_path, password, output_path, **options):
+            timed(chosen, 'embed', carrier_path, chosen.embed, carrier_path, secret_path, password, output_path,
+                  run=run, progress=progress, cancel=cancel, **options)
+
+        embed_cache.embed(chosen.name, run_backend, carrier_path, secret_path, password, output_path, options)
+        count_files(output=output_path)
+        return chosen.name
+
+# Extract the secret hidden in `carrier_path` to `output_path`. Returns the
+# name of the backend that found it.
+def extract(carrier_path, password, output_path, backend='auto', run=None, progress=None, cancel=None):
+    with metrics.job('extract', requested=backend):
+        count_files(carrier=carrier_path)
+        if backend != 'auto':
+            chosen = get(backend)
+            metrics.note(backend=chosen.name)
+            timed(chosen, 'extract', carrier_path, chosen.extract, carrier_path, password, output_path,
+                  run=run, progress=progress, cancel=cancel)
+            count_files(output=output_path)
+            return chosen.name
+
+        with metrics.span('dispatch'):
+            candidates = extract_candidates(carrier_path)
+        if not candidates:
+            raise ValueError("No available backend reads this file format.")
+        errors = []
+        for chosen in candidates:
+            try:
+                timed(chosen, 'extract', carrier_path, chosen.extract, carrier_path, password, output_path,
+                      run=run, progress=progress, cancel=cancel)
+                metrics.note(backend=chosen.name)
+                count_files(output=output_path)
+                return chosen.name
+            except (RuntimeError, ValueError) as e:
+                errors.append(f"{chosen.name}: {e}")
+        raise ValueError("Nothing could be extracted:\n" + "\n".join(errors))
@@ -0,0 +1,162 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import backends
+import capacity
+import metrics
+
+# Headless batch runner. Reads a manifest of jobs (CSV with a header row, or
+# JSON lines) and runs them on a pool of worker processes, writing one JSON
+# result line per job. Manifest fields:
+#   backend     auto | lsb | bmp | steghide | mp3stego (see backends.py); auto
+#               uses the fastest available backend for the carrier
+#   action      embed (default) | extract
+#   carrier     carrier file (the stego file for extract). For steghide embeds
+#               it may be a directory: the smallest carrier in it that holds
+#               the secret is used
+#   secret      file to hide (embed only)
+#   passphrase  env:NAME, file:PATH, or the passphrase itself
+#   output      output file (optional, defaults to a file in --output-dir). Its
+#               extension is the stego format written: auto picks a backend
+#               that writes it, and other backends fail if they do not
+#   id          job id (optional, defaults to the manifest line number)
+#   options     extra keyword arguments for the lsb/bmp backends, as a JSON object
+
+def read_manifest(path):
+    with open(path, newline='') as file:
+        if path.endswith('.csv'):
+            return [dict(row) for row in csv.DictReader(file)]
+        return [json.loads(line) for line in file if line.strip()]
+
+# Passphrases are kept out of the manifest by reference when possible
+def resolve_passphrase(reference):
+    if reference.startswith('env:'):
+        name = reference[4:]
+        if name not in os.environ:
+            raise ValueError(f"Environment variable {name} is not set.")
+        return os.environ[name]
+    if reference.startswith('file:'):
+        with open(reference[5:]) as file:
+            return file.read().rstrip('\r\n')
+    return reference
+
+# Stego file formats by output file extension
+OUTPUT_FORMATS = {'.bmp': 'bmp', '.wav': 'wav', '.au': 'au', '.jpg': 'jpeg', '.jpeg': 'jpeg', '.mp3': 'mp3'}
+
+def output_path(job, output_dir):
+    if job.get('output'):
+        return job['output']
+    if job['action'] == 'extract':
+        return os.path.join(output_dir, f"{job['id']}.txt")
+    # The stego file keeps the carrier's format unless the backend converts it
+    output_format = backends.get(job['backend']).output_format if job['backend'] != 'auto' else None
+    extension = f".{output_format}" if output_format else os.path.splitext(job['carrier'])[1]
+    base = os.path.splitext(os.path.basename(job['carrier']))[0]
+    return os.path.join(output_dir, f"{job['id']}_{base}{extension}")
+
+def run_job(job, output_dir):
+    started = time.time()
+    start = time.perf_counter()
+    result = {
+        'id': job['id'],
+        'backend': job['backend'],
+        'action': job['action'],
+        'carrier': job['carrier'],
+        'started': started,
+    }
+    # Measured backend times go back to run_batch, see backends.pending_costs
+    costs = backends.pending_costs = []
+    try:
+        # One metrics line per job, tagged with the manifest id
+        with metrics.job(job['action'], id=job['id']):
+            passphrase = resolve_passphrase(job['passphrase'])
+            if job['backend'] == 'steghide' and job['action'] == 'embed' and os.path.isdir(job['carrier']):
+                # Pick the carrier from the headers instead of failed steghide runs
+                names = sorted(os.listdir(job['carrier']))
+                paths = [os.path.join(job['carrier'], name) for name in names]
+                job = dict(job, carrier=capacity.pick_carrier(paths, job['secret']))
+                result['carrier'] = job['carrier']
+            output = output_path(job, output_dir)
+            options = job.get('options') or {}
+
+            if job['action'] == 'embed':
+                output_format = None
+                if job.get('output'):
+                    output_format = OUTPUT_FORMATS.get(os.path.splitext(output)[1].lower())
+                result['backend'] = backends.embed(job['carrier'], job['secret'], passphrase, output,
+                                                   job['backend'], output_format=output_format, **options)
+            elif job['action'] == 'extract':
+                result['backend'] = backends.extract(job['carrier'], passphrase, output, job['backend'])
+            else:
+                raise ValueError(f"Unknown action: {job['action']}")
+
+        result.update(status='ok', output=output)
+    except Exception as e:
+        result.update(status='error', error=f"{type(e).__name__}: {e}")
+    finally:
+        backends.pending_costs = None
+    result['seconds'] = time.perf_counter() - start
+    result['costs'] = costs
+    return result
+
+def run_batch(jobs, output_dir, workers=None, log=None):
+    log = log or sys.stdout
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, job, output_dir) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            backends.record_samples(result.pop('costs'))
+            failed += result['status'] != 'ok'
+            log.write(json.dumps(result) + '\n')
+            log.flush()
+    return failed
+
+def normalize_jobs(rows):
+    jobs = []
+    for number, row in enumerate(rows, 1):
+        job = {key: value for key, value in row.items() if value not in (None, '')}
+        job.setdefault('id', str(number))
+        job.setdefault('action', 'embed')
+        for field in ('backend', 'carrier', 'passphrase'):
+            if field not in job:
+                raise ValueError(f"Manifest entry {job['id']} is missing '{field}'.")
+        if job['action'] == 'embed' and 'secret' not in job:
+            raise ValueError(f"Manifest entry {job['id']} is missing 'secret'.")
+        if isinstance(job.get('options'), str):
+            job['options'] = json.loads(job['options'])
+        jobs.append(job)
+    return jobs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run steganography jobs from a manifest without the GUI.")
+    parser.add_argument('manifest', help="CSV or JSON lines manifest of jobs")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="number of parallel workers")
+    parser.add_argument('-o', '--output-dir', default='batch_output', help="directory for outputs without an explicit path")
+    parser.add_argument('-l', '--log', help="write JSON lines results here instead of stdout")
+    parser.add_argument('-m', '--metrics', help="append per-stage timings of each job here as JSON lines ('-' for stderr)")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        # The worker processes read it from the environment
+        os.environ[metrics.SINK_ENV] = args.metrics
+        metrics.configure(args.metrics)
+
+    jobs = normalize_jobs(read_manifest(args.manifest))
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.log:
+        with open(args.log, 'a') as log:
+            failed = run_batch(jobs, args.output_dir, args.jobs, log)
+    else:
+        failed = run_batch(jobs, args.output_dir, args.jobs)
+
+    print(f"{len(jobs) - failed}/{len(jobs)} jobs succeeded", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+import os
+import sys
+import json
+import time
+import wave
+import struct
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+from lsb_core import message_to_bits, embed_bits
+import backends
+import bmp_lsb
+import capacity
+import steghide_tool
+
+# Payload sizes to benchmark (label, size in bytes)
+PAYLOAD_SIZES = [("1 KB", 1024), ("100 KB", 100 * 1024), ("1 MB", 1024 * 1024)]
+
+# The original per-sample embed loop, kept here as the reference implementation
+def legacy_embed(frame_array, message):
+    message_bits = ''.join(format(c, '08b') for c in message)
+    for i, bit in enumerate(message_bits):
+        frame_array[i] = (frame_array[i] & ~1) | int(bit)
+    return frame_array
+
+def vectorized_embed(frame_array, message):
+    return embed_bits(frame_array, message_to_bits(message))
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def bench_embed(sizes=PAYLOAD_SIZES):
+    rng = np.random.default_rng(0)
+    results = []
+    for label, size in sizes:
+        message = os.urandom(size)
+        carrier = rng.integers(-32768, 32767, size * 8, dtype=np.int16)
+
+        legacy_time = time_call(legacy_embed, carrier.copy(), message)
+        vectorized_time = time_call(vectorized_embed, carrier.copy(), message)
+
+        # Both paths must produce identical samples
+        expected = legacy_embed(carrier.copy(), message)
+        actual = vectorized_embed(carrier.copy(), message)
+        if not np.array_equal(expected, actual):
+            raise AssertionError(f"Vectorized embed differs from legacy loop for {label}")
+
+        results.append((label, legacy_time, vectorized_time))
+    return results
+
+# BMP carriers (label, width, height): the bundled example size and larger photos
+BMP_SIZES = [("500x333", 500, 333), ("4 MP", 2448, 1632), ("12 MP", 4000, 3000)]
+BMP_PASSPHRASE = "benchmark"
+
+# Write a 24-bit bottom-up BMP filled with random pixels
+def write_bmp(path, width, height, rng):
+    row_size = (width * 3 + 3) // 4 * 4
+    pixel_size = row_size * height
+    with open(path, 'wb') as file:
+        file.write(b'BM' + struct.pack('<IHHI', 54 + pixel_size, 0, 0, 54))
+        file.write(struct.pack('<IiiHHIIiiII', 40, width, height, 1, 24, 0, pixel_size, 2835, 2835, 0, 0))
+        file.write(rng.integers(0, 256, pixel_size, dtype=np.uint8).tobytes())
+
+# Time the native engine against steghide on the same carrier and secret; the
+# steghide column is None when the executable is missing or cannot run here
+def bench_bmp(sizes=BMP_SIZES):
+    rng = np.random.default_rng(0)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, width, height in sizes:
+            carrier = os.path.join(workdir, f"{label}.bmp")
+            secret = os.path.join(workdir, "secret.bin")
+            write_bmp(carrier, width, height, rng)
+            # steghide can hide roughly a tenth of the carrier, keep the secret below that
+            with open(secret, 'wb') as file:
+                file.write(os.urandom(width * height * 3 // 20))
+
+            native_time = time_call(bmp_lsb.embed_file, carrier, secret, BMP_PASSPHRASE,
+                                    os.path.join(workdir, "native.bmp"))
+            try:
+                steghide_time = time_call(steghide_tool.embed, carrier, secret, BMP_PASSPHRASE,
+                                          os.path.join(workdir, "steghide.bmp"))
+            except (OSError, RuntimeError):
+                steghide_time = None
+
+            results.append((label, native_time, steghide_time))
+    return results
+
+# Synthetic carriers for the suite. The same seed always gives the same
+# bytes, so runs on different trees time identical inputs.
+SUITE_SEED = 2024
+# (name, seconds, sample width in bytes, channels) at 44.1 kHz
+WAV_CORPUS = [
+    ("wav-1s-16bit-mono", 1, 2, 1),
+    ("wav-10s-8bit-mono", 10, 1, 1),
+    ("wav-10s-16bit-stereo", 10, 2, 2),
+    ("wav-10s-24bit-stereo", 10, 3, 2),
+    ("wav-60s-16bit-stereo", 60, 2, 2),
+]
+# (name, width, height)
+BMP_CORPUS = [("bmp-500x333", 500, 333), ("bmp-4mp", 2448, 1632), ("bmp-12mp", 4000, 3000)]
+# The smallest fits the MP3Stego capacity of a few seconds of audio
+SUITE_PAYLOADS = [("32B", 32), ("1KB", 1024), ("100KB", 100 * 1024), ("1MB", 1024 * 1024)]
+SUITE_PASSPHRASE = "benchmark"
+WAV_RATE = 44100
+
+# A result is a regression when it is `threshold` slower than the baseline
+# and slower by more than the noise floor
+REGRESSION_THRESHOLD = 0.2
+NOISE_FLOOR = 0.005
+
+# Two tones under low-level noise, like real audio; MP3Stego's encoder never
+# finishes on full-scale white noise
+def write_wav(path, seconds, sampwidth, channels, rng):
+    frames = seconds * WAV_RATE
+    t = np.arange(frames)[:, None] / WAV_RATE
+    phases = rng.random(channels)
+    signal = (0.3 * np.sin(2 * np.pi * 440 * t + phases) + 0.2 * np.sin(2 * np.pi * 1234 * t)
+              + 0.05 * rng.standard_normal((frames, channels)))
+    samples = (signal * (2 ** (8 * sampwidth - 1) - 1)).astype('<i4')
+    if sampwidth == 1:
+        samples += 128  # 8-bit WAV samples are unsigned
+    data = samples.view(np.uint8).reshape(-1, 4)[:, :sampwidth]
+    with wave.open(path, 'wb') as file:
+        file.setnchannels(channels)
+        file.setsampwidth(sampwidth)
+        file.setframerate(WAV_RATE)
+        file.writeframes(data.tobytes())
+
+# Write the corpus to `workdir`; returns (name, path) of each carrier and payload
+def write_corpus(workdir, quick=False):
+    rng = np.random.default_rng(SUITE_SEED)
+    wavs, bmps, payloads = WAV_CORPUS, BMP_CORPUS, SUITE_PAYLOADS
+    if quick:
+        wavs, bmps, payloads = wavs[:3], bmps[:2], payloads[:3]
+
+    carriers = []
+    for name, seconds, sampwidth, channels in wavs:
+        path = os.path.join(workdir, f"{name}.wav")
+        write_wav(path, seconds, sampwidth, channels, rng)
+        carriers.append((name, path))
+    for name, width, height in bmps:
+        path = os.path.join(workdir, f"{name}.bmp")
+        write_bmp(path, width, height, rng)
+        carriers.append((name, path))
+
+    secrets = []
+    for name, size in payloads:
+        path = os.path.join(workdir, f"payload-{name}.bin")
+        with open(path, 'wb') as file:
+            file.write(rng.integers(0, 256, size, dtype=np.uint8).tobytes())
+        secrets.append((name, path))
+    return carriers, secrets
+
+# Best of `repeat` runs; the fastest is the least disturbed by other load
+def best_time(repeat, func, *args, **kwargs):
+    return min(time_call(lambda: func(*args, **kwargs)) for _ in range(repeat))
+
+# Fresh interpreter importing the backends and resolving one backend's tools,
+# against a bare interpreter as reference
+def startup_time(repeat, code):
+    return best_time(repeat, subprocess.run, [sys.executable, '-c', code], check=True,
+                     cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True)
+
+def files_equal(first, second):
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        return a.read() == b.read()
+
+# Time startup, capacity checks, embed and extract for every available
+# backend on the synthetic corpus. Backends are called directly, so the
+# embed cache never serves a run. `record_costs` adds the embed and extract
+# times to the cost models backends.py uses to pick a backend.
+# Returns {'meta', 'results', 'skipped'}: results map a name such as
+# "embed/lsb/wav-10s-16bit-stereo/100KB" to its seconds and sizes, skipped
+# map names that could not run to the reason.
+def run_suite(names=None, repeat=3, quick=False, record_costs=False):
+    results = {}
+    skipped = {}
+    chosen = [backend for name, backend in backends.BACKENDS.items() if not names or name in names]
+
+    results['startup/python'] = {'seconds': startup_time(repeat, 'pass')}
+    results['startup/gui'] = {'seconds': startup_time(repeat, 'import main')}
+    for backend in chosen:
+        code = f"import backends; backends.get({backend.name!r}).available()"
+        results[f"startup/{backend.name}"] = {'seconds': startup_time(repeat, code)}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        carriers, secrets = write_corpus(workdir, quick)
+        for backend in chosen:
+            for carrier_name, carrier in carriers:
+                if capacity.file_format(carrier) not in backend.formats:
+                    continue
+                for secret_name, secret in secrets:
+                    key = f"{backend.name}/{carrier_name}/{secret_name}"
+                    sizes = {'carrier_bytes': os.path.getsize(carrier), 'payload_bytes': os.path.getsize(secret)}
+                    if not backend.available('embed'):
+                        skipped[f"embed/{key}"] = "backend not available"
+                        continue
+
+                    def check_fits():
+                        room = backend.capacity(carrier)
+                        return room, backend.needed(secret, room)
+                    try:
+                        room, needed = check_fits()
+                    except (OSError, ValueError) as e:
+                        skipped[f"embed/{key}"] = str(e)
+                        continue
+                    results[f"capacity/{key}"] = dict(sizes, seconds=best_time(repeat, check_fits))
+                    if needed > room:
+                        skipped[f"embed/{key}"] = f"needs {needed} bytes, carrier holds {room}"
+                        continue
+
+                    stego = os.path.join(workdir, f"stego.{backend.output_format or capacity.file_format(carrier)}")
+                    extracted = os.path.join(workdir, "extracted.bin")
+                    stage = 'embed'
+                    try:
+                        seconds = best_time(repeat, backend.embed, carrier, secret, SUITE_PASSPHRASE, stego)
+                        results[f"embed/{key}"] = dict(sizes, seconds=seconds)
+                        if record_costs:
+                            backends.record(backend.name, 'embed', carrier, seconds)
+
+                        stage = 'extract'
+                        seconds = best_time(repeat, backend.extract, stego, SUITE_PASSPHRASE, extracted)
+                        if not files_equal(secret, extracted):
+                            raise RuntimeError("extracted secret differs from the one embedded")
+                        results[f"extract/{key}"] = dict(sizes, seconds=seconds)
+                        if record_costs:
+                            backends.record(backend.name, 'extract', stego, seconds)
+                    except (OSError, RuntimeError, ValueError) as e:
+                        skipped[f"{stage}/{key}"] = f"{type(e).__name__}: {e}"
+
+    meta = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'quick': quick,
+    }
+    return {'meta': meta, 'results': results, 'skipped': skipped}
+
+# Compare suite results against a baseline. Returns (name, baseline seconds,
+# seconds, ratio, regressed) for the names in both, in name order.
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD, noise_floor=NOISE_FLOOR):
+    rows = []
+    for name in sorted(results['results'].keys() & baseline['results'].keys()):
+        old = baseline['results'][name]['seconds']
+        new = results['results'][name]['seconds']
+        ratio = new / old if old else float('inf')
+        regressed = new > old * (1 + threshold) and new - old > noise_floor
+        rows.append((name, old, new, ratio, regressed))
+    return rows
+
+def print_suite(suite, file=None):
+    file = file or sys.stdout
+    for name, result in sorted(suite['results'].items()):
+        print(f"{name:<50} {result['seconds']:>10.4f}", file=file)
+    for name, reason in sorted(suite['skipped'].items()):
+        print(f"{name:<50} {'skipped':>10}  {' '.join(reason.split())}", file=file)
+
+def print_comparison(rows, file=None):
+    file = file or sys.stdout
+    print(f"{'benchmark':<50} {'baseline':>10} {'current':>10} {'ratio':>7}", file=file)
+    for name, old, new, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<50} {old:>10.4f} {new:>10.4f} {ratio:>6.2f}x{flag}", file=file)
+
+def load_results(path):
+    with open(path) as file:
+        return json.load(file)
+
+def print_micro():
+    print(f"{'payload':>8} {'loop (s)':>10} {'numpy (s)':>10} {'speedup':>9}")
+    for label, legacy_time, vectorized_time in bench_embed():
+        speedup = legacy_time / vectorized_time if vectorized_time else float('inf')
+        print(f"{label:>8} {legacy_time:>10.4f} {vectorized_time:>10.4f} {speedup:>8.0f}x")
+
+    print()
+    print(f"{'bmp':>8} {'native (s)':>10} {'steghide (s)':>12}")
+    for label, native_time, steghide_time in bench_bmp():
+        steghide_column = f"{steghide_time:>12.4f}" if steghide_time is not None else f"{'n/a':>12}"
+        print(f"{label:>8} {native_time:>10.4f} {steghide_column}")
+
+# `benchmark.py` alone runs the micro benchmarks above; `suite` runs the
+# backend suite and `compare` checks two saved suite results. Both exit with
+# 1 when a regression is found.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the steganography engines.")
+    commands = parser.add_subparsers(dest='command')
+    suite_parser = commands.add_parser('suite', help="time every available backend on a synthetic corpus")
+    suite_parser.add_argument('-b', '--backends', nargs='+', choices=sorted(backends.BACKENDS),
+                              help="only these backends")
+    suite_parser.add_argument('-r', '--repeat', type=int, default=3, help="runs per benchmark; the best is kept")
+    suite_parser.add_argument('-q', '--quick', action='store_true', help="smaller corpus")
+    suite_parser.add_argument('-o', '--output', help="save the results as JSON here")
+    suite_parser.add_argument('-c', '--compare', help="baseline results to check for regressions")
+    suite_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                              help="slowdown counted as a regression, as a fraction")
+    suite_parser.add_argument('--record-costs', action='store_true',
+                              help="feed the times to the backend cost models")
+    compare_parser = commands.add_parser('compare', help="compare saved suite results against a baseline")
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                                help="slowdown counted as a regression, as a fraction")
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        print_micro()
+        return 0
+
+    if args.command == 'suite':
+        results = run_suite(args.backends, args.repeat, args.quick, args.record_costs)
+        print_suite(results)
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(results, file, indent=2)
+        if not args.compare:
+            return 0
+        baseline = load_results(args.compare)
+    else:
+        results, baseline = load_results(args.results), load_results(args.baseline)
+
+    rows = compare(results, baseline, args.threshold)
+    print()
+    print_comparison(rows)
+    regressions = sum(regressed for *_, regressed in rows)
+    print(f"{regressions} regression(s) in {len(rows)} benchmarks", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import os
+import shutil
+import struct
+from collections import namedtuple
+import numpy as np
+from lsb_core import embed_lanes, segments_end, bits_before, prepare_payload, plan_segments, extract_from_lanes
+from progress import Clock, check, drive
+from metrics import span, count
+
+BI_RGB = 0
+BI_BITFIELDS = 3
+
+# Red, green and blue masks of BI_BITFIELDS pixels stored as the bytes B, G,
+# R and alpha or unused, the only layout pixel_lanes reads
+BGRA_MASKS = (0x00FF0000, 0x0000FF00, 0x000000FF)
+ALPHA_MASKS = (0, 0xFF000000)
+
+# Size of the blocks of rows embedded between progress reports
+BLOCK_BYTES = 4 * 1024 * 1024
+
+# Layout of a BMP file as found by parse_bmp. `height` is always positive;
+# `top_down` tells whether the first stored row is the top of the image.
+# `row_size` includes the padding that aligns rows to 4 bytes.
+BmpInfo = namedtuple('BmpInfo', [
+    'width', 'height', 'bitcount', 'top_down', 'pixel_offset', 'row_size',
+])
+
+# Parse the BITMAPFILEHEADER and BITMAPINFOHEADER (or a later version of it)
+def parse_bmp(path):
+    with open(path, 'rb') as file:
+        # File header, BITMAPINFOHEADER and the colour masks that follow it
+        # (or are part of the later header versions)
+        header = file.read(70)
+        file.seek(0, 2)
+        file_size = file.tell()
+
+    if len(header) < 54 or header[:2] != b'BM':
+        raise ValueError(f"{path} is not a BMP file.")
+
+    pixel_offset = struct.unpack('<I', header[10:14])[0]
+    info_size, width, height, _, bitcount, compression = struct.unpack('<IiiHHI', header[14:34])
+    if info_size < 40:
+        raise ValueError("Only BMP files with a BITMAPINFOHEADER are supported.")
+    if bitcount not in (24, 32) or compression not in (BI_RGB, BI_BITFIELDS):
+        raise ValueError("Only uncompressed 24-bit and 32-bit BMP files are supported.")
+    if compression == BI_BITFIELDS:
+        if bitcount != 32 or len(header) < 66:
+            raise ValueError(f"{path} has invalid BI_BITFIELDS colour masks.")
+        masks = struct.unpack('<III', header[54:66])
+        # The alpha mask is only part of BITMAPV3INFOHEADER and later
+        alpha = struct.unpack('<I', header[66:70])[0] if info_size >= 56 and len(header) >= 70 else 0
+        if masks != BGRA_MASKS or alpha not in ALPHA_MASKS:
+            raise ValueError("Only BI_BITFIELDS BMP files with the standard BGRA masks are supported.")
+    if width <= 0 or height == 0:
+        raise ValueError("Invalid BMP dimensions.")
+
+    row_size = (width * bitcount + 31) // 32 * 4
+    info = BmpInfo(width, abs(height), bitcount, height < 0, pixel_offset, row_size)
+    if pixel_offset + row_size * info.height > file_size:
+        raise ValueError(f"{path} is truncated.")
+    return info
+
+# Map the stored rows of the pixel array (padding included) as a 2-D byte array
+def open_pixels(path, mode='r', info=None):
+    info = info or parse_bmp(path)
+    return np.memmap(path, dtype=np.uint8, mode=mode, offset=info.pixel_offset,
+                     shape=(info.height, info.row_size))
+
+# Lanes over the colour bytes of each row, top row first, skipping row padding
+# and the alpha/unused byte of 32-bit pixels. Each pixel holds three samples.
+def pixel_lanes(pixels, info):
+    rows = pixels if info.top_down else pixels[::-1]
+    width = info.width
+    lanes = []
+    start = 0
+    for row in rows:
+        if info.bitcount == 24:
+            lanes.append((row[:width * 3], start))
+        else:
+            for channel in range(3):
+                lanes.append((row[channel:width * 4:4], start + channel * width))
+        start += width * 3
+    return lanes
+
+def sample_count(info):
+    return info.width * info.height * 3
+
+# Embed into a copy of the carrier by writing straight into a memory map of
+# the copy, as steps (see progress.py) of about BLOCK_BYTES of rows each;
+# `cancel` stops it between blocks and removes the partial output. Options
+# are those of lsb_core.prepare_payload and plan_segments.
+def embed_steps(bmp_file, message_file, passphrase, output_file, depth=None, compression='auto', scatter=False,
+                cancel=None):
+    payload, codec = prepare_payload(message_file, compression)
+    with span('parse'):
+        info = parse_bmp(bmp_file)
+    segments = plan_segments(payload, codec, passphrase, sample_count(info), depth, scatter=scatter)
+
+    # Only the rows holding the payload are visited
+    row_samples = info.width * 3
+    end_row = -(-segments_end(segments) // row_samples)
+    block_rows = max(BLOCK_BYTES // info.row_size, 1)
+    lanes_per_row = 1 if info.bitcount == 24 else 3
+    clock = Clock(end_row * info.row_size)
+
+    with span('write'):
+        shutil.copyfile(bmp_file, output_file)
+    try:
+        pixels = open_pixels(output_file, 'r+', info)
+        lanes = pixel_lanes(pixels, info)
+        try:
+            for row in range(0, end_row, block_rows):
+                check(cancel)
+                last = min(row + block_rows, end_row)
+                with span('embed'):
+                    embed_lanes(lanes[row * lanes_per_row:last * lanes_per_row], segments)
+                yield clock.progress(last * info.row_size, bits_before(segments, last * row_samples))
+            with span('write'):
+                pixels.flush()
+        finally:
+            del lanes, pixels
+    except BaseException:
+        # Cancelled or failed part way: leave no half-embedded file behind
+        os.remove(output_file)
+        raise
+    count('bits_embedded', sum(len(segment.symbols) * segment.depth for segment in segments))
+    return output_file
+
+# embed_steps run to the end
+def embed_file(bmp_file, message_file, passphrase, output_file, **options):
+    return drive(embed_steps(bmp_file, message_file, passphrase, output_file, **options))
+
+# Recover the hidden message as a memoryview over the extracted bits
+def extract_payload(bmp_file, passphrase):
+    with span('parse'):
+        info = parse_bmp(bmp_file)
+    pixels = open_pixels(bmp_file, 'r', info)
+    lanes = pixel_lanes(pixels, info)
+    with span('extract'):
+        return extract_from_lanes(lambda layout: lanes, sample_count(info), passphrase, ('interleaved',))
+
+def decode_message(bmp_file, passphrase):
+    return bytes(extract_payload(bmp_file, passphrase))
+
+# Write the hidden message straight from the extracted bits to `output_file`
+def decode_to_file(bmp_file, passphrase, output_file):
+    message = extract_payload(bmp_file, passphrase)
+    with span('write'), open(output_file, 'wb') as file:
+        file.write(message)
+    return output_file
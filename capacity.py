@@ -0,0 +1,216 @@
+import os
+import json
+import zlib
+import struct
+import hashlib
+from collections import namedtuple
+from wavfile import parse_wav
+
+# Capacity of steghide carriers, worked out from the file headers alone so an
+# oversized secret is rejected before steghide spends seconds on the carrier.
+#
+# steghide reports capacity as samples / samples-per-vertex * log2(modulus) / 8
+# bytes. Its BMP samples are pixels and its WAV/AU samples are audio samples
+# (2 per vertex); its JPEG samples are the non-zero DCT coefficients (3 per
+# vertex), which needs the whole scan decoded, so for JPEG the count of all
+# coefficients is used instead and the result is only an upper bound.
+SAMPLES_PER_VERTEX = {'bmp': 2, 'wav': 2, 'au': 2, 'jpeg': 3}
+
+# Bytes steghide adds to the compressed secret at the least: its header,
+# the CRC32, the cipher IV and the stored file name
+EMBED_OVERHEAD = 32
+
+# Small chunks let an oversized secret be rejected after little work
+COMPRESS_CHUNK = 64 * 1024
+
+# Results are cached by a fingerprint of the carrier (size, mtime and a hash
+# of its first and last blocks) in a small JSON index
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+CACHE_PATH = os.path.join(CACHE_DIR, 'capacity.json')
+CACHE_ENTRIES = 2000
+FINGERPRINT_BLOCK = 64 * 1024
+
+# `bytes` is the capacity steghide would report; `exact` is False when it is
+# only an upper bound (JPEG)
+Capacity = namedtuple('Capacity', ['format', 'samples', 'bytes', 'exact'])
+
+def bmp_samples(header):
+    if len(header) < 26:
+        raise ValueError("Truncated BMP header.")
+    info_size = struct.unpack('<I', header[14:18])[0]
+    if info_size == 12:
+        # OS/2 BITMAPCOREHEADER
+        width, height = struct.unpack('<HH', header[18:22])
+    else:
+        width, height = struct.unpack('<ii', header[18:26])
+    return abs(width) * abs(height)
+
+# AU sample sizes by encoding: mu-law, 8-bit and 16-bit linear PCM
+AU_SAMPLE_BYTES = {1: 1, 2: 1, 3: 2}
+
+def au_samples(path, header):
+    offset, size, encoding = struct.unpack('>III', header[4:16])
+    if encoding not in AU_SAMPLE_BYTES:
+        raise ValueError(f"Unsupported AU encoding {encoding}.")
+    data_size = os.path.getsize(path) - offset
+    if size != 0xFFFFFFFF:
+        data_size = min(size, data_size)
+    return max(data_size, 0) // AU_SAMPLE_BYTES[encoding]
+
+# Start-of-frame markers of baseline, extended, progressive and lossless JPEGs
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Count the DCT coefficients of all components from the frame header
+def jpeg_samples(path):
+    with open(path, 'rb') as file:
+        file.seek(2)
+        while True:
+            marker = file.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                raise ValueError(f"{path} has no JPEG frame header.")
+            if marker[1] == 0xFF:
+                # Fill byte before a marker
+                file.seek(-1, 1)
+                continue
+            length = struct.unpack('>H', file.read(2))[0]
+            if marker[1] not in SOF_MARKERS:
+                file.seek(length - 2, 1)
+                continue
+
+            frame = file.read(length - 2)
+            _, height, width, ncomponents = struct.unpack('>BHHB', frame[:6])
+            factors = [(frame[7 + i * 3] >> 4, frame[7 + i * 3] & 0x0F) for i in range(ncomponents)]
+            hmax = max(h for h, _ in factors)
+            vmax = max(v for _, v in factors)
+            blocks = 0
+            for h, v in factors:
+                # Blocks of a subsampled component, as libjpeg counts them
+                blocks += -(-width * h // (8 * hmax)) * -(-height * v // (8 * vmax))
+            return blocks * 64
+
+# Format of a file from its first bytes: 'bmp', 'wav', 'au', 'jpeg', 'mp3' or None
+def sniff_format(header):
+    if header[:2] == b'BM':
+        return 'bmp'
+    if header[:4] in (b'RIFF', b'RF64', b'BW64') and header[8:12] == b'WAVE':
+        return 'wav'
+    if header[:4] == b'.snd':
+        return 'au'
+    if header[:2] == b'\xff\xd8':
+        return 'jpeg'
+    # An ID3 tag or an MPEG audio frame sync
+    if header[:3] == b'ID3' or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    return None
+
+def file_format(path):
+    with open(path, 'rb') as file:
+        return sniff_format(file.read(64))
+
+def measure(path):
+    with open(path, 'rb') as file:
+        header = file.read(64)
+
+    kind = sniff_format(header)
+    if kind == 'bmp':
+        samples = bmp_samples(header)
+    elif kind == 'wav':
+        info = parse_wav(path)
+        samples = info.nframes * info.channels
+    elif kind == 'au':
+        samples = au_samples(path, header)
+    elif kind == 'jpeg':
+        samples = jpeg_samples(path)
+    else:
+        raise ValueError(f"{os.path.basename(path)} is not a BMP, WAV, AU or JPEG file.")
+
+    # One bit per vertex: steghide embeds with modulus 2
+    capacity = samples // SAMPLES_PER_VERTEX[kind] // 8
+    return Capacity(kind, samples, capacity, kind != 'jpeg')
+
+def fingerprint(path):
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        digest.update(file.read(FINGERPRINT_BLOCK))
+        if stat.st_size > FINGERPRINT_BLOCK:
+            file.seek(max(FINGERPRINT_BLOCK, stat.st_size - FINGERPRINT_BLOCK))
+            digest.update(file.read())
+    return f"{stat.st_size}-{stat.st_mtime_ns}-{digest.hexdigest()}"
+
+def load_index():
+    try:
+        with open(CACHE_PATH) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_index(index):
+    # Oldest entries go first; dicts keep insertion order
+    entries = list(index.items())[-CACHE_ENTRIES:]
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temp_path = f"{CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w') as file:
+            json.dump(dict(entries), file)
+        # Atomic, so batch workers saving at the same time never leave a torn file
+        os.replace(temp_path, CACHE_PATH)
+    except OSError:
+        # The cache is only an optimisation
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+# Capacity of the carrier at `path`, from the cache when it has seen the file
+def carrier_capacity(path):
+    key = fingerprint(path)
+    index = load_index()
+    if key in index:
+        return Capacity(*index[key])
+
+    capacity = measure(path)
+    index[key] = list(capacity)
+    save_index(index)
+    return capacity
+
+# Smallest size steghide can shrink the secret to (it compresses with zlib at
+# level 9 by default). Compression stops early once the result passes `limit`.
+def embedded_size(secret_path, limit=None):
+    compressor = zlib.compressobj(9)
+    size = EMBED_OVERHEAD + len(os.path.basename(secret_path).encode())
+    with open(secret_path, 'rb') as file:
+        while True:
+            chunk = file.read(COMPRESS_CHUNK)
+            if not chunk:
+                break
+            size += len(compressor.compress(chunk))
+            if limit is not None and size > limit:
+                return size
+    return size + len(compressor.flush())
+
+# Raise ValueError if `secret_path` certainly does not fit in `carrier_path`
+def check_fits(carrier_path, secret_path):
+    capacity = carrier_capacity(carrier_path)
+    needed = embedded_size(secret_path, capacity.bytes)
+    if needed > capacity.bytes:
+        raise ValueError(f"The secret file is too large for this carrier: it needs at least "
+                         f"{needed} bytes but the carrier holds at most {capacity.bytes} bytes.")
+    return capacity
+
+# The carrier with the smallest capacity that still holds `secret_path`.
+# Carriers whose capacity is exact are preferred over upper-bound estimates.
+def pick_carrier(carrier_paths, secret_path):
+    candidates = []
+    for path in carrier_paths:
+        try:
+            capacity = carrier_capacity(path)
+        except (OSError, ValueError):
+            continue
+        candidates.append((not capacity.exact, capacity.bytes, path))
+    if not candidates:
+        raise ValueError("No usable carrier found.")
+
+    needed = embedded_size(secret_path, max(capacity for _, capacity, _ in candidates))
+    fitting = sorted(candidate for candidate in candidates if candidate[1] >= needed)
+    if not fitting:
+        raise ValueError(f"No carrier is large enough: the secret needs at least {needed} bytes.")
+    return fitting[0][2]
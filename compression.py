@@ -0,0 +1,60 @@
+import bz2
+import lzma
+import zlib
+
+# Codecs by the id stored in the embedded header
+CODECS = ('none', 'zlib', 'bz2', 'lzma')
+
+COMPRESSORS = {
+    'none': bytes,
+    'zlib': lambda data: zlib.compress(data, 9),
+    'bz2': lambda data: bz2.compress(data, 9),
+    'lzma': lambda data: lzma.compress(data, preset=6),
+}
+
+DECOMPRESSORS = {
+    'none': bytes,
+    'zlib': zlib.decompress,
+    'bz2': bz2.decompress,
+    'lzma': lzma.decompress,
+}
+
+# The probe compresses a few slices spread over the payload instead of all of it
+PROBE_SLICES = 4
+PROBE_SLICE_SIZE = 16 * 1024
+
+# Compression is only worth it if the probe shrinks by at least this much
+MIN_SAVING = 0.1
+
+def compress(data, codec):
+    if codec not in COMPRESSORS:
+        raise ValueError(f"Unknown compression codec: {codec}")
+    return COMPRESSORS[codec](data)
+
+def decompress(data, codec):
+    if codec not in DECOMPRESSORS:
+        raise ValueError(f"Unknown compression codec: {codec}")
+    try:
+        return DECOMPRESSORS[codec](data)
+    except (zlib.error, OSError, lzma.LZMAError, EOFError) as e:
+        raise ValueError(f"Hidden message could not be decompressed ({codec}): {e}")
+
+def probe_sample(data):
+    view = memoryview(data)
+    if len(view) <= PROBE_SLICES * PROBE_SLICE_SIZE:
+        return bytes(view)
+    step = len(view) // PROBE_SLICES
+    return b''.join(view[i * step:i * step + PROBE_SLICE_SIZE] for i in range(PROBE_SLICES))
+
+# Pick the codec that shrinks a sample of `data` the most, or 'none' when the
+# data does not compress (already compressed files, encrypted data, media)
+def choose_codec(data):
+    sample = probe_sample(data)
+    if not sample:
+        return 'none'
+
+    sizes = {codec: len(COMPRESSORS[codec](sample)) for codec in CODECS[1:]}
+    codec = min(sizes, key=sizes.get)
+    if sizes[codec] > len(sample) * (1 - MIN_SAVING):
+        return 'none'
+    return codec
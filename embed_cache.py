@@ -0,0 +1,126 @@
+import os
+import json
+import errno
+import shutil
+import hashlib
+import tempfile
+import metrics
+from capacity import CACHE_DIR, fingerprint
+
+# Cache of embed results. Re-running a job with the same carrier, secret,
+# backend, options and passphrase hard-links the earlier stego file to the
+# new output path instead of running the backend again. Entries are files
+# named by the job key; the least recently used go once the cache grows past
+# MAX_BYTES. Outputs share their data with the cache entry, so they must be
+# replaced rather than edited in place.
+#
+# The carrier and secret are identified by path, size, mtime and a hash of
+# their first and last blocks (capacity.fingerprint), so a lookup reads a few
+# KB whatever the carrier size. The cache is only an optimisation: when it
+# cannot be read or written the job just runs.
+EMBED_CACHE_DIR = os.path.join(CACHE_DIR, 'embeds')
+SALT_PATH = os.path.join(EMBED_CACHE_DIR, 'salt')
+SALT_SIZE = 16
+MAX_BYTES = 1024 * 1024 * 1024
+
+def file_identity(path):
+    return f"{os.path.realpath(path)}\0{fingerprint(path)}\0".encode()
+
+# Random per-cache salt, so the keys do not reveal the passphrases to
+# anyone holding a precomputed table
+def cache_salt():
+    os.makedirs(EMBED_CACHE_DIR, exist_ok=True)
+    try:
+        with open(SALT_PATH, 'xb') as file:
+            file.write(os.urandom(SALT_SIZE))
+    except FileExistsError:
+        pass
+    with open(SALT_PATH, 'rb') as file:
+        return file.read()
+
+def job_key(backend, carrier_path, secret_path, password, options=None):
+    password_tag = hashlib.blake2b(password.encode(), key=cache_salt()).digest()
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(backend.encode() + b'\0')
+    digest.update(json.dumps(options or {}, sort_keys=True).encode() + b'\0')
+    digest.update(file_identity(carrier_path))
+    digest.update(file_identity(secret_path))
+    digest.update(password_tag)
+    return digest.hexdigest()
+
+# Errors of os.link that mean the file system cannot hard link these files
+NO_LINK_ERRORS = (errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EMLINK)
+
+# Hard link `source` to `target`, copying when the two are on different file
+# systems or the file system has no hard links. An existing target is replaced.
+def link_file(source, target):
+    # A unique name next to the target, so concurrent links never share it;
+    # os.link needs it not to exist
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(target) or '.')
+    os.close(fd)
+    os.remove(temp_path)
+    created = False
+    try:
+        try:
+            os.link(source, temp_path)
+        except OSError as error:
+            if error.errno not in NO_LINK_ERRORS:
+                raise
+            created = True
+            shutil.copyfile(source, temp_path)
+        created = True
+        os.replace(temp_path, target)
+    finally:
+        # Left behind on errors, and by os.replace when the target already
+        # was a link to the same file
+        if created and os.path.lexists(temp_path):
+            os.remove(temp_path)
+
+def evict(max_bytes=MAX_BYTES):
+    entries = []
+    with os.scandir(EMBED_CACHE_DIR) as scan:
+        for entry in scan:
+            if entry.is_file() and entry.name != 'salt' and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Already evicted by another process
+            pass
+        total -= size
+
+# Run run(carrier_path, secret_path, password, output_path, **options), or
+# link the output of an earlier identical run. Returns output_path.
+def embed(backend, run, carrier_path, secret_path, password, output_path, options=None):
+    entry = None
+    try:
+        with metrics.span('cache'):
+            entry = os.path.join(EMBED_CACHE_DIR, job_key(backend, carrier_path, secret_path, password, options))
+            link_file(entry, output_path)
+            # The mtime records the last use for the LRU eviction
+            os.utime(entry)
+        metrics.count('cache_hits', 1)
+        return output_path
+    except FileNotFoundError:
+        # A miss (or a missing input, which the run reports)
+        pass
+    except OSError:
+        # The cache cannot be used here, e.g. its directory is not writable
+        entry = None
+
+    run(carrier_path, secret_path, password, output_path, **(options or {}))
+    if entry is not None:
+        try:
+            with metrics.span('cache'):
+                link_file(output_path, entry)
+                evict()
+        except OSError:
+            # The job itself succeeded
+            pass
+    return output_path
@@ -1,20 +1,11 @@
 import os
-import subprocess
 import hashlib
 import time
 import customtkinter as ctk
 from tkinter import messagebox
+import backends
+import job_runner
 
-# Function to find the steghide executable
-def find_steghide():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    steghide_path = os.path.join(current_dir, 'steghide', 'steghide.exe')
-    if not os.path.exists(steghide_path):
-        raise FileNotFoundError("steghide.exe not found in the 'steghide' directory.")
-    return steghide_path
-
-# Get the path to steghide executable
-STEGHIDE_PATH = find_steghide()
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code')
 ENCODE_DIR = os.path.join(OUTPUT_DIR, 'encode')
 DECODE_DIR = os.path.join(OUTPUT_DIR, 'decode')
@@ -23,6 +14,10 @@ DECODE_DIR = os.path.join(OUTPUT_DIR, 'decode')
 os.makedirs(ENCODE_DIR, exist_ok=True)
 os.makedirs(DECODE_DIR, exist_ok=True)
 
+# Embedding engines selectable in the GUI and their backends.py names; auto
+# picks the fastest backend that fits, the native one handles BMP in-process
+ENGINES = {"auto": "auto", "steghide": "steghide", "native (BMP)": "bmp"}
+
 # Function to generate a unique filename based on hash and timestamp
 def generate_unique_filename(base_name):
     timestamp = int(time.time())
@@ -66,6 +61,9 @@ class ImageSteganography(ctk.CTkFrame):
         self.password_entry = ctk.CTkEntry(layout, placeholder_text="Password", show='*')
         self.password_entry.pack(pady=10)
 
+        self.hide_engine = ctk.CTkOptionMenu(layout, values=list(ENGINES))
+        self.hide_engine.pack(pady=10)
+
         hide_button = ctk.CTkButton(layout, text="Hide", command=self.hide_action)
         hide_button.pack(pady=10)
 
@@ -86,6 +84,9 @@ class ImageSteganography(ctk.CTkFrame):
         self.extract_password_entry = ctk.CTkEntry(layout, placeholder_text="Password", show='*')
         self.extract_password_entry.pack(pady=10)
 
+        self.extract_engine = ctk.CTkOptionMenu(layout, values=list(ENGINES))
+        self.extract_engine.pack(pady=10)
+
         extract_button = ctk.CTkButton(layout, text="Extract", command=self.extract_action)
         extract_button.pack(pady=10)
 
@@ -123,26 +124,28 @@ class ImageSteganography(ctk.CTkFrame):
             messagebox.showerror("Error", "Password is required!")
             return
 
-        output_filename = generate_unique_filename(os.path.basename(carrier_path)) + ".bmp"
+        # The stego file has the carrier's format
+        extension = os.path.splitext(carrier_path)[1] or ".bmp"
+        output_filename = generate_unique_filename(os.path.basename(carrier_path)) + extension
         output_file_path = os.path.join(ENCODE_DIR, output_filename)
 
-        command = [
-            STEGHIDE_PATH,
-            "embed",
-            "-cf", carrier_path,
-            "-ef", secret_path,
-            "-p", password,
-            "-sf", output_file_path  # Use -sf to specify output file directly.
-        ]
-
-        try:
-            result = subprocess.run(command, capture_output=True, text=True)
-            if result.returncode == 0:
-                messagebox.showinfo("Success", f"Hiding successful! File saved at:\n{output_file_path}")
-            else:
-                messagebox.showerror("Error", f"Steghide failed:\n{result.stderr}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to run Steghide: {e}")
+        engine = ENGINES[self.hide_engine.get()]
+
+        # Runs on a worker thread; hide_done reports the outcome
+        def hide(job):
+            backends.embed(carrier_path, secret_path, password, output_file_path, engine, run=job.run_command,
+                           progress=job.track, cancel=job)
+            return output_file_path
+
+        job_runner.submit(f"Hide in {os.path.basename(carrier_path)}", hide, on_done=self.hide_done)
+
+    def hide_done(self, job):
+        if job.state == job_runner.DONE:
+            messagebox.showinfo("Success", f"Hiding successful! File saved at:\n{job.result}")
+        elif isinstance(job.error, (RuntimeError, ValueError)):
+            messagebox.showerror("Error", str(job.error))
+        elif job.error:
+            messagebox.showerror("Error", f"Failed to run Steghide: {job.error}")
 
     def extract_action(self):
         carrier_path = self.extract_carrier_entry.get()
@@ -159,22 +162,23 @@ class ImageSteganography(ctk.CTkFrame):
         output_filename = generate_unique_filename(os.path.basename(carrier_path)) + ".txt"
         output_file_path = os.path.join(DECODE_DIR, output_filename)
 
-        command = [
-            STEGHIDE_PATH,
-            "extract",
-            "-sf", carrier_path,
-            "-xf", output_file_path,
-            "-p", password
-        ]
-
-        try:
-            result = subprocess.run(command, capture_output=True, text=True)
-            if result.returncode == 0:
-                messagebox.showinfo("Success", f"Extraction successful! File saved at:\n{output_file_path}")
-            else:
-                messagebox.showerror("Error", f"Steghide failed:\n{result.stderr}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to run Steghide: {e}")
+        engine = ENGINES[self.extract_engine.get()]
+
+        # Runs on a worker thread; extract_done reports the outcome
+        def extract(job):
+            backends.extract(carrier_path, password, output_file_path, engine, run=job.run_command,
+                             progress=job.track, cancel=job)
+            return output_file_path
+
+        job_runner.submit(f"Extract from {os.path.basename(carrier_path)}", extract, on_done=self.extract_done)
+
+    def extract_done(self, job):
+        if job.state == job_runner.DONE:
+            messagebox.showinfo("Success", f"Extraction successful! File saved at:\n{job.result}")
+        elif isinstance(job.error, (RuntimeError, ValueError)):
+            messagebox.showerror("Error", str(job.error))
+        elif job.error:
+            messagebox.showerror("Error", f"Failed to run Steghide: {job.error}")
 
     def reset_hide_fields(self):
         self.carrier_entry.delete(0, ctk.END)
@@ -0,0 +1,53 @@
+import customtkinter as ctk
+import job_runner
+
+# List of the jobs of a JobRunner with a progress bar and a cancel button each
+class JobPanel(ctk.CTkScrollableFrame):
+    def __init__(self, parent, runner=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.runner = runner or job_runner.runner
+        self.rows = {}
+        self.runner.add_listener(self.update_job)
+        self.runner.attach(self)
+
+    def add_row(self, job):
+        row = ctk.CTkFrame(self)
+        row.pack(fill="x", pady=2)
+        row.columnconfigure(1, weight=1)
+
+        ctk.CTkLabel(row, text=job.title, width=180, anchor="w").grid(row=0, column=0, padx=5)
+        row.bar = ctk.CTkProgressBar(row)
+        row.bar.set(0)
+        row.bar.grid(row=0, column=1, sticky="ew", padx=5)
+        row.status = ctk.CTkLabel(row, text="", width=120, anchor="w")
+        row.status.grid(row=0, column=2, padx=5)
+        row.button = ctk.CTkButton(row, text="Cancel", width=70, command=job.cancel)
+        row.button.grid(row=0, column=3, padx=5)
+        row.indeterminate = False
+        self.rows[job] = row
+        return row
+
+    def update_job(self, job):
+        row = self.rows.get(job) or self.add_row(job)
+
+        if job.state == job_runner.RUNNING and job.fraction is None and not row.indeterminate:
+            # The tool reports no total (or nothing at all): keep the bar moving
+            row.bar.configure(mode="indeterminate")
+            row.bar.start()
+            row.indeterminate = True
+        elif job.fraction is not None or job.state != job_runner.RUNNING:
+            if row.indeterminate:
+                row.bar.stop()
+                row.bar.configure(mode="determinate")
+                row.indeterminate = False
+            row.bar.set(1 if job.state == job_runner.DONE else job.fraction or 0)
+
+        if job.state == job_runner.RUNNING:
+            row.status.configure(text=job.text or "running")
+        else:
+            row.status.configure(text=job.state)
+        if job.state in (job_runner.DONE, job_runner.FAILED, job_runner.CANCELLED):
+            row.button.configure(text="Clear", command=lambda: self.remove_row(job))
+
+    def remove_row(self, job):
+        self.rows.pop(job).destroy()
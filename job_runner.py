@@ -0,0 +1,192 @@
+import os
+import re
+import queue
+import codecs
+import asyncio
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from progress import parse_progress, describe
+
+# Runs GUI jobs off the Tk main thread. An asyncio loop on a background thread
+# schedules the jobs and runs the tools with asyncio.create_subprocess_exec,
+# reading their output as it comes to follow their progress. Each job is a
+# plain function run on a worker thread; it starts tools through
+# Job.run_command. Updates are queued and handed to Tk by attach(), which
+# polls the queue with `after`, so callbacks always run on the Tk thread.
+
+READ_SIZE = 4096
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+class Job:
+    def __init__(self, runner, title, function, args, on_done):
+        self.runner = runner
+        self.title = title
+        self.function = function
+        self.args = args
+        self.on_done = on_done
+        self.state = QUEUED
+        self.fraction = None
+        self.text = ''
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.future = None
+        self.command_future = None
+
+    def progress(self, fraction=None, text=''):
+        self.fraction = fraction
+        self.text = text
+        self.runner.notify(self)
+
+    # Report a progress.Progress yielded by engine steps; the job is their
+    # cancellation token, so a job function passes `progress=job.track, cancel=job`
+    def track(self, progress):
+        self.progress(*describe(progress))
+
+    # Stop the job. A running tool is killed; engine steps given the job as
+    # their token stop at the next block, and any other work done in-process
+    # by the job function finishes in the background with its result dropped.
+    def cancel(self):
+        self.cancelled = True
+        if self.command_future:
+            self.command_future.cancel()
+        if self.future:
+            self.future.cancel()
+
+    # Run `command` from the job function and wait for it, reporting its
+    # progress. Returns a subprocess.CompletedProcess like subprocess.run with
+    # capture_output=True, text=True; raises CancelledError on cancel.
+    def run_command(self, command, cwd=None):
+        if self.cancelled:
+            raise CancelledError()
+        self.command_future = asyncio.run_coroutine_threadsafe(self.runner.command(self, command, cwd), self.runner.loop)
+        if self.cancelled:
+            # Cancelled while the command was being scheduled
+            self.command_future.cancel()
+        try:
+            return self.command_future.result()
+        finally:
+            self.command_future = None
+
+class JobRunner:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count()
+        self.events = queue.Queue()
+        self.listeners = []
+        self.loop = None
+        self.slots = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.loop:
+                return
+            self.loop = asyncio.new_event_loop()
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    # Queue function(job, *args) and return its Job. `on_done(job)` is called on
+    # the Tk thread once the job has finished, failed or been cancelled.
+    def submit(self, title, function, *args, on_done=None):
+        self.start()
+        job = Job(self, title, function, args, on_done)
+        job.future = asyncio.run_coroutine_threadsafe(self.run(job), self.loop)
+        self.notify(job)
+        return job
+
+    async def run(self, job):
+        if self.slots is None:
+            # Created on the loop's own thread
+            self.slots = asyncio.Semaphore(self.workers)
+        try:
+            async with self.slots:
+                job.state = RUNNING
+                self.notify(job)
+                job.result = await self.loop.run_in_executor(self.executor, job.function, job, *job.args)
+                job.state = DONE
+        except (asyncio.CancelledError, CancelledError):
+            job.state = CANCELLED
+        except Exception as e:
+            job.state = FAILED
+            job.error = e
+        self.notify(job)
+        if job.on_done:
+            self.events.put((job.on_done, job))
+
+    async def command(self, job, command, cwd=None):
+        process = await asyncio.create_subprocess_exec(
+            *command, cwd=cwd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.gather(self.read_output(job, process.stdout),
+                                                  self.read_output(job, process.stderr))
+            returncode = await process.wait()
+        except asyncio.CancelledError:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                # Exited on its own meanwhile
+                pass
+            await process.wait()
+            raise
+        return subprocess.CompletedProcess(command, returncode, stdout, stderr)
+
+    # Collect a stream of the tool's output, reporting progress for each line.
+    # Progress counters are redrawn in place with \r, so that ends a line too.
+    async def read_output(self, job, stream):
+        output = []
+        pending = ''
+        # Incremental, so characters split across reads decode correctly
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while chunk := await stream.read(READ_SIZE):
+            text = decoder.decode(chunk)
+            output.append(text)
+            *lines, pending = re.split(r'[\r\n]', pending + text)
+            for line in lines:
+                self.report(job, line)
+        self.report(job, pending)
+        return ''.join(output)
+
+    def report(self, job, line):
+        progress = parse_progress(line)
+        if progress:
+            job.progress(*progress)
+
+    def notify(self, job):
+        self.events.put((None, job))
+
+    # Call `listener(job)` on the Tk thread whenever a job is added or changes
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def poll(self):
+        while True:
+            try:
+                callback, job = self.events.get_nowait()
+            except queue.Empty:
+                return
+            if callback:
+                callback(job)
+            else:
+                for listener in self.listeners:
+                    listener(job)
+
+    # Deliver queued updates to Tk every `interval` milliseconds
+    def attach(self, widget, interval=100):
+        def tick():
+            self.poll()
+            widget.after(interval, tick)
+        widget.after(interval, tick)
+
+# One runner shared by all GUI tabs
+runner = JobRunner()
+
+def submit(title, function, *args, on_done=None):
+    return runner.submit(title, function, *args, on_done=on_done)
@@ -0,0 +1,321 @@
+import os
+import struct
+import hashlib
+import hmac
+import zlib
+from collections import namedtuple
+import numpy as np
+from compression import CODECS, compress, decompress, choose_codec
+import metrics
+
+# Carrier-independent parts of the native LSB engines: the embedded header,
+# payload preparation, symbol packing and sample placement. A carrier engine
+# exposes its samples as "lanes", a list of (1-D array view, index of its
+# first sample in the logical sample sequence) pairs sorted by index.
+
+# On-carrier header: magic, format version, bits per sample of the payload,
+# sample order, compression codec, payload length (bytes, as stored), CRC32 of
+# the stored payload, scattered placement flag, KDF salt and passphrase
+# key-check tag. The header itself is always stored at one bit per sample at
+# the start of the sample sequence so it can be read before the depth is
+# known, and a wrong passphrase is rejected from the header alone.
+HEADER_MAGIC = b'STGA'
+HEADER_VERSION = 6
+HEADER_FORMAT = '>4sBBBBIIB8s8s'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+Header = namedtuple('Header', ['depth', 'layout', 'codec', 'length', 'checksum', 'scatter', 'salt', 'key_check'])
+
+# A run of symbols embedded at `depth` bits per sample. Sequential segments
+# occupy samples [offset, offset + len(symbols)); scattered segments (`key`
+# set) spread them over [offset, offset + span), see scatter_range.
+Segment = namedtuple('Segment', ['offset', 'symbols', 'depth', 'span', 'key'])
+
+# PBKDF2 parameters for the passphrase key-check tag and the scatter key
+KDF_ITERATIONS = 100_000
+SALT_SIZE = 8
+KEY_CHECK_SIZE = 8
+SCATTER_KEY_SIZE = 16
+
+# Symbols per counter value of the scatter position generator
+SCATTER_BATCH = 64 * 1024
+
+# Number of low bits per sample the payload may use
+MAX_DEPTH = 4
+
+# Sample orders: 'interleaved' walks samples in file order, 'channel' fills
+# each channel completely before moving on to the next one
+LAYOUTS = ('interleaved', 'channel')
+
+# Split a byte string into `depth`-bit symbols (MSB first, one symbol per element)
+def message_to_bits(data, depth=1):
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    if depth == 1:
+        return bits
+    bits = np.concatenate([bits, np.zeros(-len(bits) % depth, dtype=np.uint8)])
+    weights = (1 << np.arange(depth - 1, -1, -1)).astype(np.uint8)
+    return bits.reshape(-1, depth) @ weights
+
+# Collect the low `depth` bits of each sample back into bytes (as a memoryview
+# over the packed array, so the payload is not copied again)
+def bits_to_message(samples, depth=1):
+    symbols = (samples & ((1 << depth) - 1)).astype(np.uint8)
+    if depth == 1:
+        return memoryview(np.packbits(symbols))
+    shifts = np.arange(depth - 1, -1, -1, dtype=np.uint8)
+    return memoryview(np.packbits(((symbols[:, None] >> shifts) & 1).ravel()))
+
+# Write symbols into the low `depth` bits of the first len(symbols) samples
+def embed_bits(samples, symbols, depth=1):
+    count = len(symbols)
+    mask = samples.dtype.type((1 << depth) - 1)
+    samples[:count] = (samples[:count] & ~mask) | symbols.astype(samples.dtype)
+    return samples
+
+# Samples needed for a payload of `payload_size` bytes at each depth
+def plan_capacity(payload_size):
+    header = HEADER_SIZE * 8
+    return {depth: header + -(-payload_size * 8 // depth) for depth in range(1, MAX_DEPTH + 1)}
+
+# Smallest depth whose sample requirement fits in `available` samples
+def choose_depth(payload_size, available):
+    for depth, needed in plan_capacity(payload_size).items():
+        if needed <= available:
+            return depth
+    raise ValueError("Message is too large for the carrier.")
+
+# Read the secret file as raw bytes into a preallocated buffer, so any file
+# type can be hidden
+def read_payload(message_file):
+    with open(message_file, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        payload = bytearray(size)
+        if file.readinto(payload) != size:
+            raise ValueError("Message file changed while it was being read.")
+    return payload
+
+# Derive the key-check tag and the scatter key from the passphrase
+def derive_keys(passphrase, salt):
+    key = hashlib.pbkdf2_hmac('sha256', passphrase.encode('utf-8'), salt, KDF_ITERATIONS,
+                              KEY_CHECK_SIZE + SCATTER_KEY_SIZE)
+    return key[:KEY_CHECK_SIZE], int.from_bytes(key[KEY_CHECK_SIZE:], 'little')
+
+def build_header(payload, salt, check, depth=1, layout='interleaved', codec='none', scatter=False):
+    return struct.pack(HEADER_FORMAT, HEADER_MAGIC, HEADER_VERSION, depth,
+                       LAYOUTS.index(layout), CODECS.index(codec), len(payload), zlib.crc32(payload),
+                       scatter, salt, check)
+
+def parse_header(data):
+    magic, version, depth, layout, codec, length, checksum, scatter, salt, tag = struct.unpack(HEADER_FORMAT, data)
+    if magic != HEADER_MAGIC:
+        raise ValueError("No hidden message found in the carrier.")
+    if version != HEADER_VERSION:
+        raise ValueError(f"Unsupported message format version: {version}")
+    if not 1 <= depth <= MAX_DEPTH:
+        raise ValueError(f"Unsupported bit depth in header: {depth}")
+    if layout >= len(LAYOUTS):
+        raise ValueError(f"Unsupported sample order in header: {layout}")
+    if codec >= len(CODECS):
+        raise ValueError(f"Unsupported compression codec in header: {codec}")
+    return Header(depth, LAYOUTS[layout], CODECS[codec], length, checksum, bool(scatter), salt, tag)
+
+# Lay out header and payload as segments. With `scatter` the payload is spread
+# over all `available` samples after the header using the passphrase key.
+def layout_payload(payload, passphrase, depth, layout='interleaved', codec='none', scatter=False, available=None):
+    salt = os.urandom(SALT_SIZE)
+    check, scatter_key = derive_keys(passphrase, salt)
+    header_bits = message_to_bits(build_header(payload, salt, check, depth, layout, codec, scatter))
+    symbols = message_to_bits(payload, depth)
+
+    base = len(header_bits)
+    if scatter:
+        payload_segment = Segment(base, symbols, depth, available - base, scatter_key)
+    else:
+        payload_segment = Segment(base, symbols, depth, len(symbols), None)
+    return [Segment(0, header_bits, 1, len(header_bits), None), payload_segment]
+
+# Keyed placement of scattered symbols. The segment's span is cut into one
+# equal interval per symbol and symbol i lands on a random sample inside
+# interval i, so positions come out sorted and never collide. Offsets come
+# from a counter-based Philox generator with one counter value per batch of
+# SCATTER_BATCH symbols, so the positions falling in any sample range [start,
+# end) are produced on their own without a full permutation in memory.
+# Returns the index of the first symbol in range and the sample positions.
+def scatter_range(segment, start, end):
+    count = len(segment.symbols)
+    if count == 0:
+        return 0, np.zeros(0, dtype=np.int64)
+    span = segment.span
+    first = max(0, (start - segment.offset) * count // span - 1)
+    last = min(count, -(-(end - segment.offset) * count // span) + 1)
+    if first >= last:
+        return first, np.zeros(0, dtype=np.int64)
+
+    step, extra = divmod(span, count)
+    parts = []
+    for batch in range(first // SCATTER_BATCH, -(-last // SCATTER_BATCH)):
+        low = batch * SCATTER_BATCH
+        high = min(low + SCATTER_BATCH, count)
+        rng = np.random.Generator(np.random.Philox(key=segment.key, counter=batch))
+        index = np.arange(low, high, dtype=np.int64)
+        starts = index * step + index * extra // count
+        widths = (index + 1) * step + (index + 1) * extra // count - starts
+        parts.append(segment.offset + starts + (rng.random(high - low) * widths).astype(np.int64))
+
+    base = first // SCATTER_BATCH * SCATTER_BATCH
+    positions = np.concatenate(parts)[first - base:last - base]
+    inside = (positions >= start) & (positions < end)
+    skipped = int(np.argmax(inside)) if inside.any() else 0
+    return first + skipped, positions[inside]
+
+# Group lanes into runs that cover consecutive samples
+def contiguous_runs(lanes):
+    runs = []
+    for lane, start in lanes:
+        if runs and runs[-1][-1][1] + len(runs[-1][-1][0]) == start:
+            runs[-1].append((lane, start))
+        else:
+            runs.append([(lane, start)])
+    return runs
+
+# Embed every part of `segments` that falls in `lanes`. Scattered positions are
+# generated once per run of consecutive lanes and split between them with a
+# binary search, so carriers with many short lanes (image rows) stay cheap.
+def embed_lanes(lanes, segments):
+    for segment in segments:
+        if segment.key is None:
+            end = segment.offset + len(segment.symbols)
+            for lane, start in lanes:
+                low = max(segment.offset, start)
+                high = min(end, start + len(lane))
+                if low < high:
+                    embed_bits(lane[low - start:high - start],
+                               segment.symbols[low - segment.offset:high - segment.offset], segment.depth)
+            continue
+
+        for run in contiguous_runs(lanes):
+            run_end = run[-1][1] + len(run[-1][0])
+            first, positions = scatter_range(segment, run[0][1], run_end)
+            symbols = segment.symbols[first:first + len(positions)]
+            for lane, start in run:
+                low, high = np.searchsorted(positions, [start, start + len(lane)])
+                if low < high:
+                    index = positions[low:high] - start
+                    mask = lane.dtype.type((1 << segment.depth) - 1)
+                    lane[index] = (lane[index] & ~mask) | symbols[low:high].astype(lane.dtype)
+
+def segments_end(segments):
+    segment = segments[-1]
+    return segment.offset + (segment.span if segment.key is not None else len(segment.symbols))
+
+# Payload bits held by the samples before `end`; scattered segments are
+# counted in proportion to the part of their span covered
+def bits_before(segments, end):
+    bits = 0
+    for segment in segments:
+        count = len(segment.symbols)
+        if segment.key is None:
+            bits += min(max(end - segment.offset, 0), count) * segment.depth
+        else:
+            bits += min(max(end - segment.offset, 0), segment.span) * count // segment.span * segment.depth
+    return bits
+
+# Gather the samples in [start, end) of the logical sample sequence
+def read_lanes(lanes, start, end):
+    parts = []
+    for lane, offset in lanes:
+        low = max(start, offset)
+        high = min(end, offset + len(lane))
+        if low < high:
+            parts.append(lane[low - offset:high - offset])
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
+
+# Gather the samples at sorted positions of the logical sample sequence
+def gather_lanes(lanes, positions):
+    parts = []
+    for lane, start in lanes:
+        low, high = np.searchsorted(positions, [start, start + len(lane)])
+        if low < high:
+            parts.append(lane[positions[low:high] - start])
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
+
+# Read the secret and compress it. `compression` is one of CODECS, or 'auto' to
+# pick one from a quick probe of the message. Returns the payload and its codec.
+def prepare_payload(message_file, compression='auto'):
+    with metrics.span('read'):
+        payload = read_payload(message_file)
+
+    with metrics.span('pack'):
+        codec = choose_codec(payload) if compression == 'auto' else compression
+        if codec != 'none':
+            compressed = compress(payload, codec)
+            if len(compressed) < len(payload):
+                payload = compressed
+            else:
+                # Stored raw, so the header must not name the codec
+                codec = 'none'
+    metrics.count('payload_bytes', len(payload))
+    return payload, codec
+
+# Check the options against a carrier with `available` samples and lay out the
+# header and payload. `depth` is the number of low bits per sample used for the
+# payload (1-4), None lets the capacity planner pick the smallest that fits.
+def plan_segments(payload, codec, passphrase, available, depth=None, layout='interleaved', scatter=False):
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown sample order: {layout}")
+
+    if depth is None:
+        depth = choose_depth(len(payload), available)
+    elif not 1 <= depth <= MAX_DEPTH:
+        raise ValueError(f"Bit depth must be between 1 and {MAX_DEPTH}.")
+    elif plan_capacity(len(payload))[depth] > available:
+        raise ValueError("Message is too large for the carrier.")
+
+    with metrics.span('pack'):
+        return layout_payload(payload, passphrase, depth, layout, codec, scatter, available)
+
+# Recover the hidden message from a carrier with `available` samples.
+# `lanes_for(layout)` returns the carrier's lanes in a sample order; the
+# header is looked for in each order of `layouts`.
+def extract_from_lanes(lanes_for, available, passphrase, layouts=LAYOUTS):
+    header_end = HEADER_SIZE * 8
+    if available < header_end:
+        raise ValueError("No hidden message found in the carrier.")
+
+    for layout in layouts:
+        lanes = lanes_for(layout)
+        header = bytes(bits_to_message(read_lanes(lanes, 0, header_end)))
+        if header.startswith(HEADER_MAGIC):
+            break
+
+    header = parse_header(header)
+    if header.layout != layout:
+        # Sample orders that coincide for this carrier find the header first
+        lanes = lanes_for(header.layout)
+        if bytes(bits_to_message(read_lanes(lanes, 0, header_end)))[:len(HEADER_MAGIC)] != HEADER_MAGIC:
+            raise ValueError("No hidden message found in the carrier.")
+
+    # Reject a wrong passphrase before any payload samples are read
+    check, scatter_key = derive_keys(passphrase, header.salt)
+    if not hmac.compare_digest(check, header.key_check):
+        raise ValueError("Incorrect passphrase.")
+
+    payload_end = plan_capacity(header.length)[header.depth]
+    if payload_end > available:
+        raise ValueError("Carrier is too short for the hidden message.")
+
+    if header.scatter:
+        segment = Segment(header_end, np.empty(payload_end - header_end, dtype=np.uint8),
+                          header.depth, available - header_end, scatter_key)
+        samples = gather_lanes(lanes, scatter_range(segment, header_end, available)[1])
+    else:
+        samples = read_lanes(lanes, header_end, payload_end)
+    payload = bits_to_message(samples, header.depth)[:header.length]
+
+    if zlib.crc32(payload) != header.checksum:
+        raise ValueError("Hidden message is corrupted (checksum mismatch).")
+
+    if header.codec != 'none':
+        payload = memoryview(decompress(payload, header.codec))
+
+    return payload
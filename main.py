@@ -1,54 +1,87 @@
 # main.py
+import sys
+import time
+import importlib
+from startup_report import ImportTimer
+
+# `--startup-report` prints how long startup and each import took. The timer
+# goes in before the other imports so they are measured too.
+STARTED = time.perf_counter()
+timer = None
+if __name__ == "__main__" and "--startup-report" in sys.argv:
+    timer = ImportTimer()
+    timer.install()
+
 import customtkinter as ctk
-from images import ImageSteganography
-from audio2 import AudioSteganography
-from audio3 import AudioSteganography3
+from job_panel import JobPanel
+
+# Drawer buttons and the module and frame class behind each. A module is only
+# imported, and its frame built, the first time its button is clicked.
+TABS = [
+    ("Images", "images", "ImageSteganography"),
+    ("Audio", "audio2", "AudioSteganography"),
+    ("Audio3", "audio3", "AudioSteganography3"),
+]
 
 class SteganographyTool(ctk.CTk):
-    def __init__(self):
+    def __init__(self, timer=None):
         super().__init__()
         self.title("Steganography Tool")
         self.geometry("800x600")
         self.resizable(False, False)
+        self.timer = timer
+        # The startup report is printed once, after the default tab is built
+        self.reported = False
+        self.tabs = {}
+        self.current_tab = None
 
         # Add drawer for navigation
         self.drawer = ctk.CTkFrame(self, width=200)
         self.drawer.pack(side="left", fill="y")
 
+        # Progress of the running and finished jobs of all tabs
+        self.job_panel = JobPanel(self, height=110)
+        self.job_panel.pack(side="bottom", fill="x")
+
         self.main_frame = ctk.CTkFrame(self)
         self.main_frame.pack(side="right", expand=True, fill="both")
 
         self.add_drawer_items()
-        self.setup_pane()
+        # Show the window first, then load the default tab
+        self.after_idle(self.setup_pane)
 
     def add_drawer_items(self):
         ctk.CTkLabel(self.drawer, text="Menu", font=("Arial", 16, "bold")).pack(pady=20)
-        ctk.CTkButton(self.drawer, text="Images", command=self.load_image_tab).pack(pady=10)
-        ctk.CTkButton(self.drawer, text="Audio", command=self.load_audio_tab).pack(pady=10)
-        ctk.CTkButton(self.drawer, text="Audio3", command=self.load_audio_tab3).pack(pady=10)
+        for label, _, _ in TABS:
+            ctk.CTkButton(self.drawer, text=label, command=lambda label=label: self.load_tab(label)).pack(pady=10)
 
     def setup_pane(self):
-        self.image_tab = ImageSteganography(self.main_frame)
-        self.audio_tab = AudioSteganography(self.main_frame)
-        self.audio_tab3 = AudioSteganography3(self.main_frame)
-        self.load_image_tab()  # Default to image tab
-
-    def load_image_tab(self):
-        self.hide_all_tabs()
-        self.image_tab.pack(expand=True, fill="both")
-
-    def load_audio_tab(self):
-        self.hide_all_tabs()
-        self.audio_tab.pack(expand=True, fill="both")
-        
-    def load_audio_tab3(self):
-        self.hide_all_tabs()
-        self.audio_tab3.pack(expand=True, fill="both")
-
-    def hide_all_tabs(self):
-        for tab in [self.image_tab, self.audio_tab]:
-            tab.pack_forget()
+        if self.timer:
+            self.timer.stage("window ready", time.perf_counter() - STARTED)
+        self.load_tab(TABS[0][0])  # Default to image tab
+
+    def build_tab(self, label):
+        module_name, class_name = next((module, frame) for name, module, frame in TABS if name == label)
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        imported = time.perf_counter()
+        tab = getattr(module, class_name)(self.main_frame)
+        if self.timer:
+            self.timer.stage(f"import {module_name}", imported - start)
+            self.timer.stage(f"build {class_name}", time.perf_counter() - imported)
+        return tab
+
+    def load_tab(self, label):
+        if label not in self.tabs:
+            self.tabs[label] = self.build_tab(label)
+            if self.timer and not self.reported:
+                self.timer.report()
+                self.reported = True
+        if self.current_tab:
+            self.current_tab.pack_forget()
+        self.current_tab = self.tabs[label]
+        self.current_tab.pack(expand=True, fill="both")
 
 if __name__ == "__main__":
-    app = SteganographyTool()
+    app = SteganographyTool(timer)
     app.mainloop()
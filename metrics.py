@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import nullcontext
+from concurrent.futures import CancelledError
+
+# Per-stage timing of embed and extract jobs. backends.embed/extract open a
+# job record; the engines time their stages with span() and add byte counts
+# with count(), and the record is written as one JSON line to the sink when
+# the job ends:
+#   {"time": ..., "job": "embed", "backend": "lsb", "status": "ok",
+#    "seconds": 0.21, "spans": {"read": ..., "embed": ...},
+#    "counters": {"carrier_bytes": ..., "secret_bytes": ...}, "pid": ...}
+# Spans are read, parse, pack (compression, key derivation, bit expansion),
+# embed, extract, write and subprocess (waiting on steghide/Encode.exe/
+# Decode.exe); a span entered several times adds up.
+#
+# The sink is the file named by STEGO_METRICS ('-' for stderr), or the one
+# given to configure(). With no sink job() records nothing and span()/count()
+# return at the first check, so the disabled cost is one attribute lookup.
+
+SINK_ENV = 'STEGO_METRICS'
+
+sink = os.environ.get(SINK_ENV) or None
+sink_lock = threading.Lock()
+state = threading.local()
+
+class Record:
+    def __init__(self, kind, fields):
+        self.kind = kind
+        self.fields = fields
+        self.spans = {}
+        self.counters = {}
+
+class Span:
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        spans = self.record.spans
+        spans[self.name] = spans.get(self.name, 0.0) + time.perf_counter() - self.start
+
+# Append records to `path` ('-' for stderr); None turns metrics off
+def configure(path):
+    global sink
+    sink = path
+
+# The record of the job running on this thread, None when not recording
+def current():
+    return getattr(state, 'record', None)
+
+# Time a stage of the current job
+def span(name):
+    record = getattr(state, 'record', None)
+    if record is None:
+        return nullcontext()
+    return Span(record, name)
+
+def count(name, amount):
+    record = getattr(state, 'record', None)
+    if record is not None:
+        record.counters[name] = record.counters.get(name, 0) + amount
+
+# Set fields of the current job's line, e.g. the backend once it is chosen
+def note(**fields):
+    record = getattr(state, 'record', None)
+    if record is not None:
+        record.fields.update(fields)
+
+def emit(line):
+    text = json.dumps(line) + '\n'
+    with sink_lock:
+        if sink == '-':
+            sys.stderr.write(text)
+            return
+        try:
+            # One write per line in append mode, so lines from the worker
+            # processes of batch.py do not interleave
+            with open(sink, 'a') as file:
+                file.write(text)
+        except OSError:
+            # Metrics never fail a job
+            pass
+
+class Job:
+    def __init__(self, kind, fields):
+        self.record = Record(kind, fields)
+
+    def __enter__(self):
+        state.record = self.record
+        self.started = time.time()
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self.start
+        state.record = None
+        if exc_type is None:
+            status = 'ok'
+        elif issubclass(exc_type, CancelledError):
+            status = 'cancelled'
+        else:
+            status = 'error'
+        line = {'time': self.started, 'job': self.record.kind, **self.record.fields, 'status': status,
+                'seconds': seconds, 'spans': self.record.spans, 'counters': self.record.counters,
+                'pid': os.getpid()}
+        if status == 'error':
+            line['error'] = f"{exc_type.__name__}: {exc}"
+        emit(line)
+
+# Record the job run in the `with` block. Inside another job it adds to that
+# job's line instead, so a caller such as batch.py can wrap backends.embed
+# and add its own fields.
+def job(kind, **fields):
+    if sink is None:
+        return nullcontext()
+    record = current()
+    if record is not None:
+        record.fields.update(fields)
+        return nullcontext(record)
+    return Job(kind, fields)
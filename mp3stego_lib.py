@@ -0,0 +1,199 @@
+import os
+import time
+import ctypes
+import threading
+import multiprocessing
+from concurrent.futures import CancelledError
+from mp3stego_tool import TABLES_DIR
+from metrics import span
+
+# Library binding for the MP3Stego encoder and decoder. The shared libraries
+# are built from the sources in audioTools with
+#   make -C audioTools/libmp3stego
+# and take buffers in and return buffers out, so no process is started per
+# call and no temporary or side files are written.
+LIBRARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audioTools', 'libmp3stego')
+ENCODE_LIBRARY = os.path.join(LIBRARY_DIR, 'libmp3stego_encode.so')
+DECODE_LIBRARY = os.path.join(LIBRARY_DIR, 'libmp3stego_decode.so')
+DEFAULT_BITRATE = 128
+
+# A call that hangs inside the C code cannot be stopped from Python, so the
+# libraries are called in worker processes, one for the encoder and one for
+# the decoder. A worker is started on first use and kept for the next calls;
+# a call that is cancelled or runs longer than its timeout (CALL_TIMEOUT plus
+# CALL_TIMEOUT_PER_MB per MB of input) kills it, and the next call starts a
+# new one. Each library holds the global state of one run, so the calls to a
+# worker are serialized. Workers are spawned rather than forked: a fork of the
+# GUI or of a threaded batch worker copies its threads' locks mid-use.
+CALL_TIMEOUT = 30
+CALL_TIMEOUT_PER_MB = 10
+POLL_INTERVAL = 0.1
+MB = 1024 * 1024
+
+libraries = {}
+
+def available():
+    return os.path.exists(ENCODE_LIBRARY) and os.path.exists(DECODE_LIBRARY)
+
+def load_library(path):
+    if path in libraries:
+        return libraries[path]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{os.path.basename(path)} not found, build it with 'make -C audioTools/libmp3stego'.")
+
+    library = ctypes.CDLL(path)
+    output = [ctypes.POINTER(ctypes.POINTER(ctypes.c_ubyte)), ctypes.POINTER(ctypes.c_size_t)]
+    if hasattr(library, 'mp3stego_encode'):
+        library.mp3stego_encode.argtypes = [
+            ctypes.c_char_p, ctypes.c_size_t, ctypes.c_char_p, ctypes.c_size_t,
+            ctypes.c_char_p, ctypes.c_int, *output,
+        ]
+    else:
+        library.mp3stego_decode.argtypes = [
+            ctypes.c_char_p, ctypes.c_size_t, ctypes.c_char_p, ctypes.c_char_p, *output,
+        ]
+    library.mp3stego_error.restype = ctypes.c_char_p
+    library.mp3stego_release.argtypes = [ctypes.c_void_p]
+    libraries[path] = library
+    return library
+
+# Copy a buffer returned by the library into bytes and free it
+def take_buffer(library, data, size):
+    try:
+        return ctypes.string_at(data, size.value)
+    finally:
+        library.mp3stego_release(data)
+
+def check(library, status):
+    if status != 0:
+        message = library.mp3stego_error().decode(errors='replace')
+        raise RuntimeError(f"MP3Stego failed:\n{message}")
+
+# The library calls, run in the workers
+def library_encode(wav, secret, password, bitrate):
+    data = ctypes.POINTER(ctypes.c_ubyte)()
+    size = ctypes.c_size_t()
+    library = load_library(ENCODE_LIBRARY)
+    status = library.mp3stego_encode(
+        wav, len(wav), secret, len(secret or b''),
+        password.encode(), bitrate, ctypes.byref(data), ctypes.byref(size),
+    )
+    check(library, status)
+    return take_buffer(library, data, size)
+
+def library_decode(mp3, password):
+    data = ctypes.POINTER(ctypes.c_ubyte)()
+    size = ctypes.c_size_t()
+    library = load_library(DECODE_LIBRARY)
+    status = library.mp3stego_decode(
+        mp3, len(mp3), password.encode(), TABLES_DIR.encode(),
+        ctypes.byref(data), ctypes.byref(size),
+    )
+    check(library, status)
+    return take_buffer(library, data, size)
+
+# Worker process main loop: run each (function, args) received and send back
+# (True, result) or (False, exception)
+def serve(connection):
+    while True:
+        try:
+            function, args = connection.recv()
+        except EOFError:
+            return
+        try:
+            connection.send((True, function(*args)))
+        except Exception as error:
+            connection.send((False, error))
+
+class Worker:
+    def __init__(self):
+        self.forget()
+        # A forked child (a batch worker) cannot use its parent's worker, nor
+        # a lock a parent thread may have held; it starts its own
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.forget)
+
+    def forget(self):
+        self.lock = threading.Lock()
+        self.process = None
+        self.connection = None
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def stop(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+        self.process = None
+
+    def call(self, function, args, size, cancel=None):
+        timeout = CALL_TIMEOUT + CALL_TIMEOUT_PER_MB * size / MB
+        with self.lock:
+            if self.process is None or not self.process.is_alive():
+                self.start()
+            try:
+                self.connection.send((function, args))
+                deadline = time.monotonic() + timeout
+                while not self.connection.poll(POLL_INTERVAL):
+                    if cancel is not None and cancel.cancelled:
+                        raise CancelledError()
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"MP3Stego did not finish within {timeout:.0f} seconds.")
+                    if not self.process.is_alive():
+                        raise RuntimeError("MP3Stego worker process exited.")
+                ok, value = self.connection.recv()
+            except EOFError:
+                self.stop()
+                raise RuntimeError("MP3Stego worker process exited.")
+            except BaseException:
+                # Cancelled, timed out or interrupted: the library state is
+                # unknown, so the worker goes
+                self.stop()
+                raise
+        if not ok:
+            raise value
+        return value
+
+encoder = Worker()
+decoder = Worker()
+
+# Encode the WAV file contents `wav` to MP3, hiding `secret` in it. With no
+# secret the audio is only encoded. `cancel` is a cancellation token, see
+# progress.py.
+def encode_bytes(wav, secret, password, bitrate=DEFAULT_BITRATE, cancel=None):
+    wav = bytes(wav)
+    secret = bytes(secret) if secret is not None else None
+    return encoder.call(library_encode, (wav, secret, password, bitrate), len(wav), cancel)
+
+# Return the data hidden in the MP3 file contents `mp3`
+def decode_bytes(mp3, password, cancel=None):
+    mp3 = bytes(mp3)
+    return decoder.call(library_decode, (mp3, password), len(mp3), cancel)
+
+# File based wrappers with the arguments of mp3stego_tool.embed and extract
+def embed(carrier_path, secret_path, password, output_path, bitrate=DEFAULT_BITRATE, cancel=None):
+    with span('read'):
+        with open(carrier_path, 'rb') as file:
+            wav = file.read()
+        with open(secret_path, 'rb') as file:
+            secret = file.read()
+    # Encoding and embedding are one library call
+    with span('embed'):
+        mp3 = encode_bytes(wav, secret, password, bitrate, cancel)
+    with span('write'), open(output_path, 'wb') as file:
+        file.write(mp3)
+    return output_path
+
+def extract(carrier_path, password, output_path, cancel=None):
+    with span('read'), open(carrier_path, 'rb') as file:
+        mp3 = file.read()
+    with span('extract'):
+        secret = decode_bytes(mp3, password, cancel)
+    with span('write'), open(output_path, 'wb') as file:
+        file.write(secret)
+    return output_path
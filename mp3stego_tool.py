@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+import tool_registry
+from progress import command_steps, drive
+
+TABLES_DIR = os.path.join(tool_registry.MP3STEGO_DIR, 'tables')
+
+# Every Encode.exe/Decode.exe run gets its own scratch directory as working
+# directory, so runs never share side files (Decode.exe always writes the
+# decoded PCM) and the process working directory is never changed. Only the
+# wanted output is moved out; the directory is removed with everything else.
+# Point STEGO_SCRATCH_DIR at a tmpfs such as /dev/shm to keep the scratch
+# files in memory.
+SCRATCH_ROOT = os.environ.get('STEGO_SCRATCH_DIR')
+
+# Names of the files written inside the scratch directory
+ENCODE_OUTPUT = 'output.mp3'
+DECODE_PCM = 'decoded.pcm'
+DECODE_OUTPUT = 'hidden.txt'
+
+# Paths of Encode.exe and Decode.exe, found on first use by the tool registry
+def find_encode():
+    return tool_registry.tool_path('encode')
+
+def find_decode():
+    return tool_registry.tool_path('decode')
+
+# Run a tool as steps, see steghide_tool.steghide_steps
+def tool_steps(command, cwd=None, cancel=None, total=None, run=None):
+    result = yield from command_steps(command, cwd, cancel, total, run)
+    if result.returncode != 0:
+        raise RuntimeError(f"MP3Stego failed:\n{result.stderr}")
+    return result
+
+# A fresh scratch directory, removed on exit. Decode.exe looks up its tables
+# in 'tables' under its working directory, so `tables` links them in (hard
+# links, falling back to copies).
+@contextmanager
+def scratch_dir(tables=False):
+    with tempfile.TemporaryDirectory(prefix='mp3stego-', dir=SCRATCH_ROOT) as scratch:
+        if tables:
+            tables_dir = os.path.join(scratch, 'tables')
+            try:
+                shutil.copytree(TABLES_DIR, tables_dir, copy_function=os.link)
+            except (OSError, shutil.Error):
+                # Never copy over the links: that would write into the originals
+                shutil.rmtree(tables_dir, ignore_errors=True)
+                shutil.copytree(TABLES_DIR, tables_dir)
+        yield scratch
+
+# Move the file `name` written by the tool out of the scratch directory
+def collect(scratch, name, output_path):
+    source = os.path.join(scratch, name)
+    if not os.path.exists(source):
+        raise RuntimeError(f"MP3Stego failed:\nno {name} was written.")
+    try:
+        os.replace(source, output_path)
+    except OSError:
+        # Scratch directory on another file system
+        shutil.copyfile(source, output_path)
+    return output_path
+
+# Commands run inside a scratch directory; the inputs are given as absolute paths
+def embed_command(carrier_path, secret_path, password, encode_path=None):
+    return [
+        encode_path or find_encode(),
+        "-E", os.path.abspath(secret_path),
+        "-P", password,
+        os.path.abspath(carrier_path), ENCODE_OUTPUT
+    ]
+
+def extract_command(carrier_path, password, decode_path=None):
+    return [
+        decode_path or find_decode(),
+        "-P", password, "-X", os.path.abspath(carrier_path), DECODE_PCM, DECODE_OUTPUT
+    ]
+
+# Encode the WAV `carrier_path` to MP3 at `output_path`, hiding `secret_path` in it
+def embed_steps(carrier_path, secret_path, password, output_path, encode_path=None, run=None, cancel=None):
+    with scratch_dir() as scratch:
+        command = embed_command(carrier_path, secret_path, password, encode_path)
+        yield from tool_steps(command, scratch, cancel, os.path.getsize(carrier_path), run)
+        return collect(scratch, ENCODE_OUTPUT, output_path)
+
+# Extract the text hidden in the MP3 `carrier_path` to `output_path`
+def extract_steps(carrier_path, password, output_path, decode_path=None, run=None, cancel=None):
+    with scratch_dir(tables=True) as scratch:
+        command = extract_command(carrier_path, password, decode_path)
+        yield from tool_steps(command, scratch, cancel, os.path.getsize(carrier_path), run)
+        return collect(scratch, DECODE_OUTPUT, output_path)
+
+def embed(carrier_path, secret_path, password, output_path, encode_path=None, run=None):
+    return drive(embed_steps(carrier_path, secret_path, password, output_path, encode_path, run))
+
+def extract(carrier_path, password, output_path, decode_path=None, run=None):
+    return drive(extract_steps(carrier_path, password, output_path, decode_path, run))
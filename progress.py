@@ -0,0 +1,166 @@
+import re
+import time
+import queue
+import threading
+import subprocess
+from collections import namedtuple
+from concurrent.futures import CancelledError
+from metrics import span
+
+# Long embeds and extracts are written as generators ("steps") that do the
+# work a block at a time and yield a Progress after each block. Between
+# blocks they check a cancellation token, any object with a `cancelled`
+# attribute (a CancelToken, or a job_runner.Job), and raise CancelledError
+# once it is set. The generator's return value is the result of the call;
+# drive() runs one to the end.
+
+# `done` and `total` are carrier bytes (None when the tool reports no total),
+# `bits` the payload bits written so far (None if unknown) and `eta` the
+# seconds left (None until it can be estimated)
+Progress = namedtuple('Progress', ['done', 'total', 'bits', 'eta'])
+
+# Progress printed by the external tools, most specific first
+PROGRESS_PATTERNS = [
+    # MP3Stego encoder: [Frame     12 of   3456] (0.35%)
+    (re.compile(r'\[Frame\s+(\d+)\s+of\s+(\d+)\]'), lambda m: int(m[1]) / max(int(m[2]), 1)),
+    # steghide: embedding "secret.txt" in "cover.bmp"... 42.5%
+    (re.compile(r'(\d+(?:\.\d+)?)%'), lambda m: float(m[1]) / 100),
+    # MP3Stego decoder: [Frame   12], no total
+    (re.compile(r'\[Frame\s+(\d+)\]'), lambda m: None),
+]
+
+# How often a running tool is checked for cancellation, how long it is
+# given to exit after being asked to terminate, and how long it may run at
+# all before it is taken to be stuck
+POLL_INTERVAL = 0.1
+TERMINATE_TIMEOUT = 5
+COMMAND_TIMEOUT = 600
+
+# Fraction done (None if unknown) and a short text for one line of tool output
+def parse_progress(line):
+    for pattern, fraction in PROGRESS_PATTERNS:
+        match = pattern.search(line)
+        if match:
+            return fraction(match), match[0]
+    return None
+
+class CancelToken:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+def check(cancel):
+    if cancel is not None and cancel.cancelled:
+        raise CancelledError()
+
+# Builds the Progress of a job of `total` bytes, estimating the time left
+# from the rate so far
+class Clock:
+    def __init__(self, total):
+        self.total = total
+        self.start = time.perf_counter()
+
+    def progress(self, done, bits=None):
+        elapsed = time.perf_counter() - self.start
+        eta = elapsed * (self.total - done) / done if done and self.total is not None else None
+        return Progress(done, self.total, bits, eta)
+
+# Fraction done (None if unknown) and a short text for a Progress
+def describe(progress):
+    if not progress.total or progress.done is None:
+        return None, ''
+    text = f"{progress.done / 1048576:.1f} of {progress.total / 1048576:.1f} MB"
+    if progress.eta is not None:
+        text += f", {progress.eta:.0f} s left"
+    return min(progress.done / progress.total, 1.0), text
+
+# Steps for a call that cannot be split into blocks: `cancel` is only
+# checked before it starts
+def call_steps(cancel, function, *args, **kwargs):
+    check(cancel)
+    result = function(*args, **kwargs)
+    yield from ()
+    return result
+
+# Run `steps` to the end, passing each Progress to `on_progress`, and return its result
+def drive(steps, on_progress=None):
+    while True:
+        try:
+            progress = next(steps)
+        except StopIteration as stop:
+            return stop.value
+        if on_progress:
+            on_progress(progress)
+
+def read_lines(stream, lines, output):
+    for line in iter(stream.readline, ''):
+        output.append(line)
+        lines.put(line)
+    lines.put(None)
+
+# Run `command` as steps, yielding a Progress for each progress line it
+# prints; `total` is the carrier size the reported fraction applies to. On
+# cancel, or when it runs longer than `timeout` seconds (raising
+# subprocess.TimeoutExpired), the child is terminated (killed if it does not
+# exit in time).
+# Returns a subprocess.CompletedProcess like subprocess.run with
+# capture_output=True, text=True. `run` runs the command instead, see
+# steghide_tool.steghide_steps; it then does its own progress and cancelling.
+def command_steps(command, cwd=None, cancel=None, total=None, run=None, timeout=COMMAND_TIMEOUT):
+    if run:
+        with span('subprocess'):
+            return run(command, cwd=cwd)
+    check(cancel)
+    # The span includes the time the caller takes over each Progress
+    with span('subprocess'):
+        return (yield from popen_steps(command, cwd, cancel, total, timeout))
+
+def popen_steps(command, cwd, cancel, total, timeout=COMMAND_TIMEOUT):
+    clock = Clock(total)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    process = subprocess.Popen(command, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, errors='replace')
+    # Progress counters are redrawn in place with \r, which universal
+    # newlines turn into line ends
+    lines = queue.Queue()
+    stdout, stderr = [], []
+    readers = [threading.Thread(target=read_lines, args=(process.stdout, lines, stdout), daemon=True),
+               threading.Thread(target=read_lines, args=(process.stderr, lines, stderr), daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    try:
+        open_streams = len(readers)
+        while open_streams:
+            check(cancel)
+            if deadline is not None and time.monotonic() > deadline:
+                raise subprocess.TimeoutExpired(command, timeout, ''.join(stdout), ''.join(stderr))
+            try:
+                line = lines.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if line is None:
+                open_streams -= 1
+                continue
+            parsed = parse_progress(line)
+            if parsed and parsed[0] is not None and total:
+                yield clock.progress(int(parsed[0] * total))
+            elif parsed:
+                yield Progress(None, total, None, None)
+        returncode = process.wait(None if deadline is None else max(deadline - time.monotonic(), 0))
+    except BaseException:
+        # Cancelled, timed out, or the caller closed the generator
+        process.terminate()
+        try:
+            process.wait(TERMINATE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        raise
+    finally:
+        for reader in readers:
+            reader.join(POLL_INTERVAL)
+
+    return subprocess.CompletedProcess(command, returncode, ''.join(stdout), ''.join(stderr))
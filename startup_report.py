@@ -0,0 +1,70 @@
+import sys
+import time
+from importlib.abc import MetaPathFinder
+
+# Startup timing for `main.py --startup-report`: how long each module import
+# took, broken down like `python -X importtime` (self and cumulative time per
+# module), plus named stages such as building a tab.
+
+class ImportTimer(MetaPathFinder):
+    def __init__(self):
+        self.imports = []  # (name, depth, self seconds, cumulative seconds)
+        self.stack = []
+        self.stages = []
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    # Let the other finders find the module and time its loader
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = TimedLoader(self, spec.loader)
+                return spec
+        return None
+
+    def timed(self, name, run):
+        # Children add their cumulative time here to get this module's self time
+        self.stack.append(0.0)
+        index = len(self.imports)
+        self.imports.append(None)
+        start = time.perf_counter()
+        try:
+            return run()
+        finally:
+            cumulative = time.perf_counter() - start
+            children = self.stack.pop()
+            self.imports[index] = (name, len(self.stack), cumulative - children, cumulative)
+            if self.stack:
+                self.stack[-1] += cumulative
+
+    def stage(self, name, seconds):
+        self.stages.append((name, seconds))
+
+    def report(self, file=None, limit=25):
+        file = file or sys.stderr
+        for name, seconds in self.stages:
+            print(f"startup: {name:<30} {seconds * 1000:>9.1f} ms", file=file)
+        imports = [entry for entry in self.imports if entry]
+        print("import time: self [us] | cumulative | imported package", file=file)
+        for name, depth, own, cumulative in sorted(imports, key=lambda entry: -entry[3])[:limit]:
+            print(f"import time: {own * 1e6:>9.0f} | {cumulative * 1e6:>10.0f} | {'  ' * depth}{name}", file=file)
+
+class TimedLoader:
+    def __init__(self, timer, loader):
+        self.timer = timer
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.timer.timed(module.__name__, lambda: self.loader.exec_module(module))
+
+    # Anything else (get_resource_reader, is_package, ...) goes to the real loader
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
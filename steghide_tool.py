@@ -0,0 +1,55 @@
+import os
+import tool_registry
+from progress import command_steps, drive
+
+# Path of the steghide executable, found on first use by the tool registry
+def find_steghide():
+    return tool_registry.tool_path('steghide')
+
+# Run steghide as steps (see progress.py); `total` is the carrier size its
+# reported fraction applies to, and `cancel` terminates it. `run` runs the
+# command instead of subprocess.Popen and returns a
+# subprocess.CompletedProcess; the GUI passes one that reports progress.
+def steghide_steps(command, cancel=None, total=None, run=None):
+    result = yield from command_steps(command, cancel=cancel, total=total, run=run)
+    if result.returncode != 0:
+        raise RuntimeError(f"Steghide failed:\n{result.stderr}")
+    return result
+
+def embed_command(carrier_path, secret_path, password, output_path, steghide_path=None):
+    return [
+        steghide_path or find_steghide(),
+        "embed",
+        "-cf", carrier_path,
+        "-ef", secret_path,
+        "-p", password,
+        "-sf", output_path  # Use -sf to specify output file directly.
+    ]
+
+def extract_command(carrier_path, password, output_path, steghide_path=None):
+    return [
+        steghide_path or find_steghide(),
+        "extract",
+        "-sf", carrier_path,
+        "-xf", output_path,
+        "-p", password
+    ]
+
+# Hide `secret_path` in `carrier_path`, writing the stego file to `output_path`
+def embed_steps(carrier_path, secret_path, password, output_path, steghide_path=None, run=None, cancel=None):
+    command = embed_command(carrier_path, secret_path, password, output_path, steghide_path)
+    yield from steghide_steps(command, cancel, os.path.getsize(carrier_path), run)
+    return output_path
+
+# Extract the file hidden in `carrier_path` to `output_path`
+def extract_steps(carrier_path, password, output_path, steghide_path=None, run=None, cancel=None):
+    command = extract_command(carrier_path, password, output_path, steghide_path)
+    yield from steghide_steps(command, cancel, os.path.getsize(carrier_path), run)
+    return output_path
+
+def embed(carrier_path, secret_path, password, output_path, steghide_path=None, run=None):
+    return drive(embed_steps(carrier_path, secret_path, password, output_path, steghide_path, run))
+
+def extract(carrier_path, password, output_path, steghide_path=None, run=None):
+    return drive(extract_steps(carrier_path, password, output_path, steghide_path, run))
+
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules live at the top of the repository; appended, so its code.py
+# does not shadow the standard library module pytest imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
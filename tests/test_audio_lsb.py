@@ -0,0 +1,52 @@
+import os
+import numpy as np
+import pytest
+import audio_lsb
+import benchmark
+from compression import CODECS
+
+PASSWORD = 'password'
+
+@pytest.fixture(scope='module')
+def carrier(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('carrier') / 'carrier.wav')
+    benchmark.write_wav(path, 2, 2, 2, np.random.default_rng(0))
+    return path
+
+def round_trip(tmp_path, carrier, secret, **options):
+    secret_path = tmp_path / 'secret'
+    secret_path.write_bytes(secret)
+    output = audio_lsb.embed_file(carrier, str(secret_path), PASSWORD, str(tmp_path / 'stego.wav'), **options)
+    return audio_lsb.decode_message(output, PASSWORD)
+
+TEXT = b'line of a log file that compresses well\n' * 200
+
+@pytest.mark.parametrize('compression', ['auto', *CODECS])
+@pytest.mark.parametrize('layout', ['interleaved', 'channel'])
+def test_codec_and_layout(tmp_path, carrier, compression, layout):
+    assert round_trip(tmp_path, carrier, TEXT, compression=compression, layout=layout) == TEXT
+
+# Incompressible data is stored raw whatever codec was asked for
+@pytest.mark.parametrize('compression', CODECS)
+def test_explicit_codec_on_random_data(tmp_path, carrier, compression):
+    secret = os.urandom(5000)
+    assert round_trip(tmp_path, carrier, secret, compression=compression) == secret
+
+@pytest.mark.parametrize('depth', [1, 2, 3, 4])
+@pytest.mark.parametrize('mode', ['mmap', 'stream'])
+@pytest.mark.parametrize('scatter', [False, True])
+def test_depth_mode_and_scatter(tmp_path, carrier, depth, mode, scatter):
+    secret = os.urandom(3000)
+    assert round_trip(tmp_path, carrier, secret, depth=depth, mode=mode, scatter=scatter,
+                      block_frames=4096) == secret
+
+def test_wrong_passphrase(tmp_path, carrier):
+    secret_path = tmp_path / 'secret'
+    secret_path.write_bytes(TEXT)
+    output = audio_lsb.embed_file(carrier, str(secret_path), PASSWORD, str(tmp_path / 'stego.wav'))
+    with pytest.raises(ValueError, match='passphrase'):
+        audio_lsb.decode_message(output, 'not the password')
+
+def test_too_large(tmp_path, carrier):
+    with pytest.raises(ValueError, match='too large'):
+        round_trip(tmp_path, carrier, os.urandom(200000), depth=1)
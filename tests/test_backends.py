@@ -0,0 +1,101 @@
+import gzip
+import wave
+import numpy as np
+import pytest
+import backends
+import embed_cache
+import mp3stego_lib
+
+MP3STEGO = backends.BACKENDS['mp3stego']
+
+# Keep the embed cache and the cost records of the runs out of the repository
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(embed_cache, 'EMBED_CACHE_DIR', str(tmp_path / 'embeds'))
+    monkeypatch.setattr(embed_cache, 'SALT_PATH', str(tmp_path / 'embeds' / 'salt'))
+    monkeypatch.setattr(backends, 'COSTS_PATH', str(tmp_path / 'costs.json'))
+
+# Stereo WAV of `granules` MP3 frames of tones, whose MP3Stego capacity is
+# granules // 4 - 4 bytes
+def write_carrier(path, granules):
+    frames = granules * 1152
+    t = np.arange(frames)[:, None] / 44100
+    signal = 0.3 * np.sin(2 * np.pi * 440 * t + np.array([0, 1])) + 0.2 * np.sin(2 * np.pi * 1234 * t)
+    with wave.open(str(path), 'wb') as file:
+        file.setnchannels(2)
+        file.setsampwidth(2)
+        file.setframerate(44100)
+        file.writeframes((signal * 32767).astype('<i2').tobytes())
+    return str(path)
+
+def write_secret(path, size):
+    path.write_bytes(np.random.default_rng(size).bytes(size))
+    return str(path)
+
+@pytest.mark.parametrize('size', [0, 1, 30, 31, 1000, 100000])
+def test_mp3stego_needed_matches_gzip_and_padding(tmp_path, size):
+    secret = write_secret(tmp_path / 'secret', size)
+    with open(secret, 'rb') as file:
+        compressed = gzip.compress(file.read(), compresslevel=6, mtime=0)
+    assert MP3STEGO.needed(secret) == (len(compressed) // 8 + 1) * 8
+
+def test_mp3stego_capacity_boundary(tmp_path):
+    carrier = write_carrier(tmp_path / 'carrier.wav', 272)
+    room = MP3STEGO.capacity(carrier)
+    assert room == 64
+
+    # Largest random secret that still fits, and one byte more
+    size = max(n for n in range(room) if MP3STEGO.needed(write_secret(tmp_path / 'secret', n)) <= room)
+    fits = write_secret(tmp_path / 'fits', size)
+    too_large = write_secret(tmp_path / 'too_large', size + 1)
+    assert MP3STEGO.needed(fits) == room
+    assert MP3STEGO.needed(too_large, room) > room
+
+    with pytest.raises(ValueError, match='too large'):
+        backends.embed(carrier, too_large, 'password', str(tmp_path / 'out.mp3'), backend='mp3stego')
+    if not mp3stego_lib.available():
+        return
+    assert MP3STEGO in backends.embed_candidates(carrier, fits, 'mp3')
+    backends.embed(carrier, fits, 'password', str(tmp_path / 'out.mp3'), backend='mp3stego')
+    backends.extract(str(tmp_path / 'out.mp3'), 'password', str(tmp_path / 'found'))
+    assert (tmp_path / 'found').read_bytes() == (tmp_path / 'fits').read_bytes()
+
+# Random bytes with a run of zeros, which zlib shrinks by less than
+# compression.MIN_SAVING, so the LSB engines store them raw
+def write_weak_secret(path, size):
+    data = np.random.default_rng(size).bytes(size - size // 20) + bytes(size // 20)
+    path.write_bytes(data)
+    return str(path)
+
+@pytest.mark.parametrize('name', ['random', 'weak'])
+def test_lsb_capacity_boundary(tmp_path, name):
+    write = write_secret if name == 'random' else write_weak_secret
+    carrier = write_carrier(tmp_path / 'carrier.wav', 4)
+    lsb = backends.BACKENDS['lsb']
+    room = lsb.capacity(carrier)
+    fits = write(tmp_path / 'fits', room)
+    too_large = write(tmp_path / 'too_large', room + 1)
+    assert lsb.needed(fits) == room
+    assert lsb.needed(too_large) == room + 1
+
+    assert lsb not in backends.embed_candidates(carrier, too_large)
+    with pytest.raises(ValueError, match='too large'):
+        backends.embed(carrier, too_large, 'password', str(tmp_path / 'out.wav'), backend='lsb')
+    assert lsb in backends.embed_candidates(carrier, fits)
+    backends.embed(carrier, fits, 'password', str(tmp_path / 'out.wav'), backend='lsb')
+    backends.extract(str(tmp_path / 'out.wav'), 'password', str(tmp_path / 'found'), backend='lsb')
+    assert (tmp_path / 'found').read_bytes() == (tmp_path / 'fits').read_bytes()
+
+def test_deferred_costs_are_merged_on_record(tmp_path, monkeypatch):
+    carrier = write_carrier(tmp_path / 'carrier.wav', 4)
+    backends.record('lsb', 'embed', carrier, 1.0)
+    monkeypatch.setattr(backends, 'pending_costs', [])
+    backends.record('lsb', 'embed', carrier, 2.0)
+    backends.record('bmp', 'extract', carrier, 3.0)
+    assert [seconds for _, seconds in backends.load_costs()['lsb/embed']] == [1.0]
+
+    backends.record_samples(backends.pending_costs)
+    costs = backends.load_costs()
+    assert [seconds for _, seconds in costs['lsb/embed']] == [1.0, 2.0]
+    assert [seconds for _, seconds in costs['bmp/extract']] == [3.0]
+    assert not list(tmp_path.glob('*.tmp'))
@@ -0,0 +1,71 @@
+import json
+import multiprocessing
+import numpy as np
+import pytest
+import backends
+import batch
+import benchmark
+import capacity
+import embed_cache
+import mp3stego_lib
+
+# The worker processes must inherit the patched cache paths below
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                                reason="batch workers would not see the patched cache paths")
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(embed_cache, 'EMBED_CACHE_DIR', str(tmp_path / 'embeds'))
+    monkeypatch.setattr(embed_cache, 'SALT_PATH', str(tmp_path / 'embeds' / 'salt'))
+    monkeypatch.setattr(backends, 'COSTS_PATH', str(tmp_path / 'costs.json'))
+
+def test_manifest_run(tmp_path, monkeypatch):
+    carrier = tmp_path / 'carrier.wav'
+    benchmark.write_wav(str(carrier), 8, 2, 2, np.random.default_rng(0))
+    secret = tmp_path / 'secret.txt'
+    secret.write_bytes(b'meet at the usual place\n' * 20)
+    # Small enough for MP3Stego's few bytes per second
+    short_secret = tmp_path / 'short.txt'
+    short_secret.write_bytes(b'hello world')
+    monkeypatch.setenv('BATCH_PASSPHRASE', 'password')
+    output_dir = tmp_path / 'out'
+    jobs = [
+        {'id': 'lsb', 'backend': 'lsb', 'options': {'scatter': True}},
+        {'id': 'auto', 'backend': 'auto'},
+        {'id': 'mp3', 'backend': 'auto', 'output': str(tmp_path / 'stego.mp3'), 'secret': str(short_secret)},
+        {'id': 'wrong-format', 'backend': 'lsb', 'output': str(tmp_path / 'lsb.mp3')},
+        {'id': 'no-passphrase', 'backend': 'lsb', 'passphrase': 'env:BATCH_UNSET'},
+    ]
+    manifest = tmp_path / 'jobs.jsonl'
+    defaults = {'carrier': str(carrier), 'secret': str(secret), 'passphrase': 'env:BATCH_PASSPHRASE'}
+    manifest.write_text(''.join(json.dumps({**defaults, **job}) + '\n' for job in jobs))
+    log = tmp_path / 'log.jsonl'
+
+    assert batch.main([str(manifest), '-j', '2', '-o', str(output_dir), '-l', str(log)]) == 1
+    results = {result['id']: result for result in map(json.loads, log.read_text().splitlines())}
+    assert set(results) == {job['id'] for job in jobs}
+
+    for name in ('lsb', 'auto'):
+        assert results[name]['status'] == 'ok', results[name]
+        found = tmp_path / f'{name}.txt'
+        backends.extract(results[name]['output'], 'password', str(found))
+        assert found.read_bytes() == secret.read_bytes()
+    assert results['lsb']['output'] == str(output_dir / 'lsb_carrier.wav')
+    assert 'costs' not in results['lsb']
+
+    if mp3stego_lib.available():
+        assert results['mp3']['status'] == 'ok', results['mp3']
+        assert results['mp3']['backend'] == 'mp3stego'
+        assert capacity.file_format(str(tmp_path / 'stego.mp3')) == 'mp3'
+        backends.extract(str(tmp_path / 'stego.mp3'), 'password', str(tmp_path / 'mp3.txt'))
+        assert (tmp_path / 'mp3.txt').read_bytes() == short_secret.read_bytes()
+    else:
+        assert results['mp3']['status'] == 'error'
+    assert results['wrong-format']['status'] == 'error'
+    assert 'writes wav files, not mp3' in results['wrong-format']['error']
+    assert not (tmp_path / 'lsb.mp3').exists()
+    assert 'BATCH_UNSET' in results['no-passphrase']['error']
+
+    # The workers' timings were recorded by the parent
+    costs = backends.load_costs()
+    assert len(costs['lsb/embed']) == 1 + (results['auto']['backend'] == 'lsb')
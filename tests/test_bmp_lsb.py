@@ -0,0 +1,35 @@
+import struct
+import pytest
+import bmp_lsb
+
+# 32-bit BI_BITFIELDS BMP with the given (red, green, blue) masks, after a
+# BITMAPINFOHEADER or, with `alpha`, inside a BITMAPV4HEADER
+def write_bitfields_bmp(path, masks, alpha=None, width=4, height=2):
+    info_size = 40 if alpha is None else 108
+    extra = struct.pack('<III', *masks)
+    if alpha is not None:
+        extra += struct.pack('<I', alpha) + bytes(108 - 56)
+    pixel_offset = 14 + 40 + len(extra)
+    pixel_size = width * 4 * height
+    with open(path, 'wb') as file:
+        file.write(b'BM' + struct.pack('<IHHI', pixel_offset + pixel_size, 0, 0, pixel_offset))
+        file.write(struct.pack('<IiiHHIIiiII', info_size, width, height, 1, 32, bmp_lsb.BI_BITFIELDS,
+                               pixel_size, 2835, 2835, 0, 0))
+        file.write(extra)
+        file.write(bytes(pixel_size))
+    return str(path)
+
+@pytest.mark.parametrize('alpha', [None, 0, 0xFF000000])
+def test_standard_masks(tmp_path, alpha):
+    info = bmp_lsb.parse_bmp(write_bitfields_bmp(tmp_path / 'image.bmp', bmp_lsb.BGRA_MASKS, alpha))
+    assert (info.width, info.height, info.bitcount) == (4, 2, 32)
+
+@pytest.mark.parametrize('masks, alpha', [
+    ((0x000000FF, 0x0000FF00, 0x00FF0000), None),  # RGBA byte order
+    ((0xFF000000, 0x00FF0000, 0x0000FF00), None),  # colour in the top three bytes
+    ((0x3FF00000, 0x000FFC00, 0x000003FF), None),  # 10 bits per channel
+    (bmp_lsb.BGRA_MASKS, 0x000000FF),              # alpha over the blue byte
+])
+def test_other_masks_rejected(tmp_path, masks, alpha):
+    with pytest.raises(ValueError, match='BGRA'):
+        bmp_lsb.parse_bmp(write_bitfields_bmp(tmp_path / 'image.bmp', masks, alpha))
@@ -0,0 +1,76 @@
+import os
+import pytest
+import embed_cache
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / 'embeds'
+    monkeypatch.setattr(embed_cache, 'EMBED_CACHE_DIR', str(path))
+    monkeypatch.setattr(embed_cache, 'SALT_PATH', str(path / 'salt'))
+    return path
+
+@pytest.fixture
+def files(tmp_path):
+    carrier, secret = tmp_path / 'carrier.wav', tmp_path / 'secret.txt'
+    carrier.write_bytes(b'carrier' * 1000)
+    secret.write_bytes(b'secret')
+    return str(carrier), str(secret)
+
+# A backend that writes its arguments and counts its runs
+class FakeBackend:
+    def __init__(self):
+        self.runs = 0
+
+    def __call__(self, carrier_path, secret_path, password, output_path, **options):
+        self.runs += 1
+        with open(output_path, 'w') as file:
+            file.write(f"{password} {sorted(options.items())} run {self.runs}")
+
+def test_hit(tmp_path, cache_dir, files):
+    run = FakeBackend()
+    first = embed_cache.embed('lsb', run, *files, 'pw', str(tmp_path / 'first'), {'depth': 2})
+    second = embed_cache.embed('lsb', run, *files, 'pw', str(tmp_path / 'second'), {'depth': 2})
+    assert run.runs == 1
+    assert open(first).read() == open(second).read()
+
+@pytest.mark.parametrize('change', ['backend', 'password', 'options', 'carrier', 'secret'])
+def test_miss(tmp_path, cache_dir, files, change):
+    run = FakeBackend()
+    embed_cache.embed('lsb', run, *files, 'pw', str(tmp_path / 'first'), {'depth': 2})
+    backend, password, options = 'lsb', 'pw', {'depth': 2}
+    if change == 'backend':
+        backend = 'bmp'
+    elif change == 'password':
+        password = 'other'
+    elif change == 'options':
+        options = {'depth': 3}
+    elif change == 'carrier':
+        # Same size, other content
+        with open(files[0], 'r+b') as file:
+            file.seek(3000)
+            file.write(b'CARRIER')
+    else:
+        with open(files[1], 'ab') as file:
+            file.write(b' changed')
+    embed_cache.embed(backend, run, *files, password, str(tmp_path / 'second'), options)
+    assert run.runs == 2
+
+def test_unwritable_cache(tmp_path, monkeypatch, files):
+    # The cache directory's parent is a file, so every cache operation fails
+    (tmp_path / 'not_a_directory').write_text('')
+    path = tmp_path / 'not_a_directory' / 'embeds'
+    monkeypatch.setattr(embed_cache, 'EMBED_CACHE_DIR', str(path))
+    monkeypatch.setattr(embed_cache, 'SALT_PATH', str(path / 'salt'))
+    run = FakeBackend()
+    for name in ('first', 'second'):
+        output = embed_cache.embed('lsb', run, *files, 'pw', str(tmp_path / name))
+        assert os.path.exists(output)
+    assert run.runs == 2
+
+def test_store_failure_keeps_result(tmp_path, cache_dir, files, monkeypatch):
+    def fail(max_bytes=None):
+        raise PermissionError('no room')
+    monkeypatch.setattr(embed_cache, 'evict', fail)
+    run = FakeBackend()
+    output = embed_cache.embed('lsb', run, *files, 'pw', str(tmp_path / 'first'))
+    assert open(output).read().endswith('run 1')
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import multiprocessing
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+import benchmark
+import mp3stego_lib
+from progress import CancelToken
+
+pytestmark = pytest.mark.skipif(not mp3stego_lib.available(),
+                                reason="build the library with 'make -C audioTools/libmp3stego'")
+
+# Short enough for the 5 second carriers, which hold roughly 764 bits
+SECRET = b'hello world'
+PASSWORD = 'pw'
+
+def carrier(tmp_path, seed, seconds=5):
+    path = str(tmp_path / f'carrier{seed}.wav')
+    benchmark.write_wav(path, seconds, 2, 2, np.random.default_rng(seed))
+    with open(path, 'rb') as file:
+        return file.read()
+
+# Seed 0 made the 64-bit decoder run out of bits, seed 5 hung the encoder on
+# a granule that quantizes to silence
+@pytest.mark.parametrize('seed', [0, 5])
+def test_round_trip(tmp_path, seed):
+    mp3 = mp3stego_lib.encode_bytes(carrier(tmp_path, seed), SECRET, PASSWORD)
+    assert mp3stego_lib.decode_bytes(mp3, PASSWORD) == SECRET
+
+def test_file_round_trip(tmp_path):
+    wav_path, secret_path = tmp_path / 'carrier.wav', tmp_path / 'secret.txt'
+    wav_path.write_bytes(carrier(tmp_path, 2))
+    secret_path.write_bytes(SECRET)
+    mp3_path = mp3stego_lib.embed(str(wav_path), str(secret_path), PASSWORD, str(tmp_path / 'out.mp3'))
+    mp3stego_lib.extract(mp3_path, PASSWORD, str(tmp_path / 'found.txt'))
+    assert (tmp_path / 'found.txt').read_bytes() == SECRET
+
+def test_timeout_kills_worker(tmp_path, monkeypatch):
+    wav = carrier(tmp_path, 3)
+    monkeypatch.setattr(mp3stego_lib, 'CALL_TIMEOUT', 0)
+    monkeypatch.setattr(mp3stego_lib, 'CALL_TIMEOUT_PER_MB', 0)
+    with pytest.raises(TimeoutError):
+        mp3stego_lib.encode_bytes(wav, SECRET, PASSWORD)
+    assert mp3stego_lib.encoder.process is None
+
+    # The next call starts a new worker
+    monkeypatch.undo()
+    mp3 = mp3stego_lib.encode_bytes(wav, SECRET, PASSWORD)
+    assert mp3stego_lib.decode_bytes(mp3, PASSWORD) == SECRET
+
+def test_cancel(tmp_path):
+    cancel = CancelToken()
+    cancel.cancel()
+    with pytest.raises(CancelledError):
+        mp3stego_lib.encode_bytes(carrier(tmp_path, 4), SECRET, PASSWORD, cancel=cancel)
+
+def round_trip(wav):
+    return mp3stego_lib.decode_bytes(mp3stego_lib.encode_bytes(wav, SECRET, PASSWORD), PASSWORD)
+
+# A forked child, like a batch worker, starts its own workers instead of
+# using the ones its parent started
+def test_forked_child(tmp_path):
+    wav = carrier(tmp_path, 6)
+    assert round_trip(wav) == SECRET
+    parent_worker = mp3stego_lib.encoder.process
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('fork')) as executor:
+        assert executor.submit(round_trip, wav).result() == SECRET
+    assert mp3stego_lib.encoder.process is parent_worker and parent_worker.is_alive()
@@ -0,0 +1,27 @@
+import sys
+import time
+import subprocess
+import pytest
+import progress
+
+def test_command_steps_result():
+    command = [sys.executable, '-c', 'import sys; print("50%"); print("oops", file=sys.stderr)']
+    steps = list(progress.popen_steps(command, None, None, 100))
+    result = progress.drive(progress.command_steps(command, total=100))
+    assert steps and steps[0].done == 50
+    assert result.returncode == 0
+    assert result.stdout == '50%\n' and result.stderr == 'oops\n'
+
+def test_command_steps_timeout_kills_the_child():
+    command = [sys.executable, '-c', 'import time; print("started", flush=True); time.sleep(60)']
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired) as error:
+        progress.drive(progress.command_steps(command, timeout=0.5))
+    assert time.monotonic() - start < 10
+    assert 'started' in error.value.stdout
+
+def test_command_steps_cancel():
+    token = progress.CancelToken()
+    token.cancel()
+    with pytest.raises(progress.CancelledError):
+        progress.drive(progress.command_steps([sys.executable, '-c', 'pass'], cancel=token))
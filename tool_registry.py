@@ -0,0 +1,150 @@
+import os
+import re
+import json
+import shutil
+import threading
+import subprocess
+from collections import namedtuple
+from capacity import CACHE_DIR
+
+# Finds the external tools on first use instead of at import, so a missing
+# backend only fails the jobs that need it. Each tool is probed once for its
+# version; the results are kept in cache/tools.json and reused while the
+# binary's mtime is unchanged, so a cold start costs one stat per tool used.
+# A tool found missing is remembered too, with PATH and the mtimes of the
+# places searched, and searched again once one of them changes.
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+MP3STEGO_DIR = os.path.join(PROJECT_DIR, 'audioTools', 'MP3Stego')
+CACHE_PATH = os.path.join(CACHE_DIR, 'tools.json')
+PROBE_TIMEOUT = 10
+
+# How to find and probe each tool. `bundled` ships with the project (Windows
+# builds); `command` is looked up on PATH (native builds, e.g. Linux steghide).
+ToolSpec = namedtuple('ToolSpec', ['bundled', 'command', 'probe_args', 'formats', 'missing'])
+
+TOOLS = {
+    'steghide': ToolSpec(
+        os.path.join(PROJECT_DIR, 'steghide', 'steghide.exe'), 'steghide', ['--version'],
+        ('jpeg', 'bmp', 'wav', 'au'),
+        "steghide not found: no runnable steghide.exe in the 'steghide' directory or steghide on PATH.",
+    ),
+    # Without arguments both print their usage, which starts with the version
+    'encode': ToolSpec(
+        os.path.join(MP3STEGO_DIR, 'Encode.exe'), None, [], ('wav',),
+        "Encode.exe not found in the 'audioTools/MP3Stego' directory or cannot run here.",
+    ),
+    'decode': ToolSpec(
+        os.path.join(MP3STEGO_DIR, 'Decode.exe'), None, [], ('mp3',),
+        "Decode.exe not found in the 'audioTools/MP3Stego' directory or cannot run here.",
+    ),
+}
+
+# A resolved tool; `version` is None when the probe printed none
+ToolInfo = namedtuple('ToolInfo', ['name', 'path', 'mtime', 'version', 'formats'])
+
+VERSION_PATTERN = re.compile(r'\d+\.\d+(?:\.\d+)*')
+
+resolved = {}
+# Search state of the tools found missing in this process
+unavailable = {}
+lock = threading.Lock()
+
+# The cached tools found and the search state of those missing, by name
+def load_cache():
+    try:
+        with open(CACHE_PATH) as file:
+            cache = json.load(file)
+        return ({name: ToolInfo(*info) for name, info in cache['found'].items()}, cache['missing'])
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        return {}, {}
+
+def save_cache(found, missing):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temp_path = f"{CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w') as file:
+            json.dump({'found': {name: list(info) for name, info in found.items()}, 'missing': missing}, file)
+        os.replace(temp_path, CACHE_PATH)
+    except OSError:
+        # The cache is only an optimisation
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+# What a search for the tool depends on: PATH and the mtimes of the bundled
+# binary and, for a command, of the PATH directories (installing into one
+# changes its mtime). Lists, to compare equal to the state read back from JSON.
+def search_state(spec):
+    path = os.environ.get('PATH', '')
+    places = [spec.bundled]
+    if spec.command:
+        places += [directory for directory in path.split(os.pathsep) if directory]
+    return [path, [[place, mtime(place)] for place in places]]
+
+# Candidate binaries, most likely to run here first
+def candidates(spec):
+    found = shutil.which(spec.command) if spec.command else None
+    paths = [spec.bundled, found] if os.name == 'nt' else [found, spec.bundled]
+    return [path for path in paths if path and os.path.exists(path)]
+
+# Run the tool once; None if it cannot run on this system (e.g. a Windows .exe on Linux)
+def probe(name, spec, path):
+    try:
+        result = subprocess.run([path, *spec.probe_args], capture_output=True, text=True,
+                                stdin=subprocess.DEVNULL, timeout=PROBE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    match = VERSION_PATTERN.search(result.stdout + result.stderr)
+    return ToolInfo(name, path, mtime(path), match[0] if match else None, list(spec.formats))
+
+def discover(name):
+    spec = TOOLS[name]
+    for path in candidates(spec):
+        info = probe(name, spec, path)
+        if info:
+            return info
+    return None
+
+# The ToolInfo of `name`, raising FileNotFoundError if it is missing or cannot run
+def tool(name):
+    with lock:
+        if name in resolved:
+            return resolved[name]
+
+        spec = TOOLS[name]
+        if name in unavailable and unavailable[name] == search_state(spec):
+            raise FileNotFoundError(spec.missing)
+
+        found, missing = load_cache()
+        info = found.get(name)
+        if info is None or mtime(info.path) != info.mtime:
+            search = search_state(spec)
+            if missing.get(name) == search:
+                unavailable[name] = search
+                raise FileNotFoundError(spec.missing)
+            info = discover(name)
+            if info is None:
+                found.pop(name, None)
+                missing[name] = unavailable[name] = search
+                save_cache(found, missing)
+                raise FileNotFoundError(spec.missing)
+            found[name] = info
+            missing.pop(name, None)
+            save_cache(found, missing)
+        resolved[name] = info
+        return info
+
+def tool_path(name):
+    return tool(name).path
+
+def available(name):
+    try:
+        tool(name)
+        return True
+    except FileNotFoundError:
+        return False
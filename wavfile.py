@@ -0,0 +1,109 @@
+import struct
+from collections import namedtuple
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# 32-bit size field value meaning "see the ds64 chunk" (RF64) or "too large"
+LARGE_SIZE = 0xFFFFFFFF
+
+# Sample sizes (bits) accepted for each format
+SUPPORTED_BITS = {
+    WAVE_FORMAT_PCM: (8, 16, 24, 32),
+    WAVE_FORMAT_IEEE_FLOAT: (32, 64),
+}
+
+# Layout of a WAV file as found by parse_wav; offsets and sizes are in bytes.
+# `format_tag` is the resolved format (the sub-format for WAVE_FORMAT_EXTENSIBLE)
+# and `sampwidth` the container size of one sample.
+WavInfo = namedtuple('WavInfo', [
+    'format_tag', 'channels', 'framerate', 'sampwidth', 'nframes',
+    'data_offset', 'data_size',
+])
+
+def parse_fmt(body):
+    format_tag, channels, framerate, _, block_align, bits = struct.unpack('<HHIIHH', body[:16])
+    if format_tag == WAVE_FORMAT_EXTENSIBLE:
+        if len(body) < 40:
+            raise ValueError("Truncated WAVE_FORMAT_EXTENSIBLE header.")
+        # The sub-format GUID starts with the plain format tag
+        format_tag = struct.unpack('<H', body[24:26])[0]
+
+    if bits not in SUPPORTED_BITS.get(format_tag, ()):
+        raise ValueError(f"Unsupported WAV sample format (format {format_tag:#06x}, {bits}-bit).")
+    if channels == 0 or block_align % channels:
+        raise ValueError("Invalid channel layout in WAV header.")
+    return format_tag, channels, framerate, block_align // channels
+
+# Chunk sizes in an RF64/BW64 file are 64-bit and live in the 'ds64' chunk;
+# the 32-bit size fields they replace hold 0xFFFFFFFF
+def parse_ds64(body):
+    _, data_size, _, table_length = struct.unpack('<QQQI', body[:28])
+    sizes = {b'data': data_size}
+    for i in range(table_length):
+        chunk_id, size = struct.unpack('<4sQ', body[28 + i * 12:40 + i * 12])
+        sizes[chunk_id] = size
+    return sizes
+
+# Walk the RIFF chunks of a WAV file and locate the 'fmt ' and 'data' chunks.
+# Only chunk headers are read, the sample data itself is never touched.
+# Plain RIFF, RF64 and BW64 files are accepted.
+def parse_wav(path):
+    with open(path, 'rb') as file:
+        riff, _, wave_id = struct.unpack('<4sI4s', file.read(12))
+        if riff not in (b'RIFF', b'RF64', b'BW64') or wave_id != b'WAVE':
+            raise ValueError(f"{path} is not a RIFF/WAVE file.")
+
+        file.seek(0, 2)
+        file_size = file.tell()
+        position = 12
+        fmt = None
+        large_sizes = {}
+
+        while position + 8 <= file_size:
+            file.seek(position)
+            chunk_id, chunk_size = struct.unpack('<4sI', file.read(8))
+            body = position + 8
+
+            if chunk_size == LARGE_SIZE:
+                if chunk_id in large_sizes:
+                    chunk_size = large_sizes[chunk_id]
+                elif chunk_id == b'data':
+                    # Oversized plain RIFF files: the data runs to the end of the file
+                    chunk_size = file_size - body
+
+            if chunk_id == b'ds64':
+                if riff == b'RIFF':
+                    raise ValueError(f"{path} has a 'ds64' chunk but is not an RF64 file.")
+                large_sizes = parse_ds64(file.read(chunk_size))
+            elif chunk_id == b'fmt ':
+                fmt = parse_fmt(file.read(chunk_size))
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{path} has a 'data' chunk before its 'fmt ' chunk.")
+                format_tag, channels, framerate, sampwidth = fmt
+                # A truncated file may declare more data than it holds
+                frame_size = sampwidth * channels
+                nframes = min(chunk_size, file_size - body) // frame_size
+                return WavInfo(format_tag, channels, framerate, sampwidth, nframes,
+                               body, nframes * frame_size)
+
+            # Chunks are word aligned
+            position = body + chunk_size + (chunk_size & 1)
+
+    raise ValueError(f"{path} has no 'data' chunk.")
+
+# Map the sample data of a WAV file as raw bytes. Use mode='r+' to modify the file in place.
+def open_data(path, mode='r', info=None):
+    info = info or parse_wav(path)
+    if info.data_size == 0:
+        raise ValueError(f"{path} has no sample data.")
+    return np.memmap(path, dtype=np.uint8, mode=mode, offset=info.data_offset, shape=(info.data_size,))
+
+# Strided view of the least significant byte of every sample in `data`, in file
+# order. WAV samples are little endian whatever their width, so this works the
+# same for 8/16/24/32-bit integers and for float mantissas without unpacking.
+def low_bytes(data, info):
+    return data[::info.sampwidth]